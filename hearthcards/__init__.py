@@ -1,5 +1,6 @@
-from .carddef import (CardDef, card_db, card_defs_from_xml, UNITY3D_CARDXML)
+from .carddef import (CardDef, CardRecord, CardStore, card_db, card_store,
+                      card_defs_from_xml, UNITY3D_CARDXML)
 from .tags import (GameTag, CardRace, CardSet, CardType, Hero, Faction, Rarity,
-                   Requirement, SpellZone, Step, Zone, Mechanics)
+                   Requirement, SpellZone, Step, Zone, Mechanics, MechanicBits)
 from .util import (hearthstone_data_dir)
 from .locale import (Locale)
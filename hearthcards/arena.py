@@ -2,8 +2,9 @@ from random import choice
 from .tags import Rarity
 from scipy.stats import binom, hypergeom
 from scipy.misc import comb
-from numpy import clip, floor, cumsum, random, sqrt
-from . import carddef, locale, tags
+from numpy import (arange, array, asarray, atleast_2d, clip, convolve,
+                   cumsum, floor, minimum, random, sqrt, zeros)
+from . import carddef, columnar, locale, tags, timing
 
 
 '''
@@ -28,21 +29,45 @@ HERO_CARD_P = {Rarity.COMMON: .3,
                Rarity.LEGENDARY: 0.07}
 
 
-def draftable_cards(lang=locale.Locale.US):
-    # Locale -> list(CardDef)
+def is_draftable(card):
+    # CardDef -> bool
     '''
-    Returns a list of arena draftable cards. Caches after the first call
-    since carddef.card_db() is an expensive call
+    True if card can be offered in an arena draft
     '''
+    return card.is_collectible and card.type != tags.CardType.HERO
+
+
+def draftable_cards(lang=locale.Locale.US, store=None):
+    # (Locale, CardStore) -> list(CardDef)
+    '''
+    Returns the list of arena draftable cards of the locale. The first call
+    loads carddef.card_store(), an expensive call, and keeps it as
+    draftable_cards.store; the list of each locale is built on its first
+    request. Passing a store, e.g. one attached with
+    hearthcards.shared.attach, replaces the cached store and lists
+    '''
+    if store is not None or getattr(draftable_cards, 'store', None) is None:
+        draftable_cards.store = carddef.card_store() if store is None \
+            else store
+        draftable_cards.data = {}
     try:
         return draftable_cards.data[lang]
-    except:
-        db = carddef.card_db()
-        draftable_cards.data = {lang: [c for c in cl if
-                                       c.is_collectible and
-                                       c.type != tags.CardType.HERO]
-                                for lang, cl in db.items()}
-        return draftable_cards.data[lang]
+    except KeyError:
+        cards = _draftable(draftable_cards.store, lang)
+        draftable_cards.data[lang] = cards
+        return cards
+
+
+def _draftable(store, lang):
+    # (CardStore, Locale) -> list(CardDef)
+    if isinstance(store, columnar.ArrayCardStore):
+        # is_draftable over the tag arrays, so that only the draftable
+        # cards of an attached store get a view
+        draftable = ((store.tag_values(tags.GameTag.COLLECTIBLE) == 1) &
+                     (store.tag_values(tags.GameTag.CARDTYPE) !=
+                      tags.CardType.HERO))
+        return store.cards_where(lang, draftable)
+    return [c for c in store.cards(lang) if is_draftable(c)]
 
 
 class CardPool(object):
@@ -71,7 +96,7 @@ class CardPool(object):
         replaces any drawn cards back into the available pool of cards
         to draw from
         '''
-        self.avail = self.initial
+        self.avail = set(self.initial)
 
     def __len__(self):  # (void) -> int
         '''
@@ -96,24 +121,44 @@ def partition_by_rarity(cards):  # (list(CardDef)) -> {Rarity: CardPool}
     Returns a map from Rarirty to a list of CardDef objects from cards
     with the appropriate rarity
     '''
-    t = {r: CardPool([c for c in cards if c.rarity == r])
-         for r in list(Rarity)}
-    # combine COMMON and FREE and delete FREE
-    # this is convienent for the arena draft selection
-    # where common and free cards are treated as the same
-    # for the pick rarity
-    t[Rarity.COMMON] |= t[Rarity.FREE]
-    del t[Rarity.FREE]
+    with timing.phase("arena.partition_by_rarity"):
+        t = {r: CardPool([c for c in cards if c.rarity == r])
+             for r in list(Rarity)}
+        # combine COMMON and FREE and delete FREE
+        # this is convienent for the arena draft selection
+        # where common and free cards are treated as the same
+        # for the pick rarity
+        t[Rarity.COMMON] |= t[Rarity.FREE]
+        del t[Rarity.FREE]
     return t
 
 
-def arena_draft(hero, card_pool):
+# column order of the probability table arrays accepted by sweep
+TABLE_RARITIES = [Rarity.COMMON, Rarity.RARE, Rarity.EPIC, Rarity.LEGENDARY]
+
+# TABLE_RARITIES column of each draftable rarity, FREE cards being offered
+# as COMMON ones like in partition_by_rarity
+RARITY_COLUMN = {r: i for i, r in enumerate(TABLE_RARITIES)}
+RARITY_COLUMN[Rarity.FREE] = RARITY_COLUMN[Rarity.COMMON]
+
+
+def arena_draft(hero, card_pool, regular_p=None, special_p=None,
+                hero_p=None):
     # (Hero, list(CardDef)) -> list(list(CardDef, 3), 30)
     '''
     Returns a list of length 30 where each item is a sublist of 3 CardDef
     objects. The distribution of cards is chosen in a way to be mirror the
-    the Hearthstone arena draft selection
+    the Hearthstone arena draft selection. regular_p, special_p and hero_p
+    default to REGULAR_TURN_P, SPECIAL_TURN_P and HERO_CARD_P
     '''
+    with timing.phase("arena.arena_draft"):
+        return _arena_draft(hero, card_pool, regular_p, special_p, hero_p)
+
+
+def _arena_draft(hero, card_pool, regular_p, special_p, hero_p):
+    regular_p = REGULAR_TURN_P if regular_p is None else regular_p
+    special_p = SPECIAL_TURN_P if special_p is None else special_p
+    hero_p = HERO_CARD_P if hero_p is None else hero_p
     N = 30
     REG_N = 26
     SPEC_N = N - REG_N
@@ -131,7 +176,7 @@ def arena_draft(hero, card_pool):
         cr = class_cards_by_rarity[rarity]
         nr = neut_cards_by_rarity[rarity]
         p = random.random()
-        return (cr.draw() if p <= HERO_CARD_P[rarity] and
+        return (cr.draw() if p <= hero_p[rarity] and
                 len(cr) > 0 else nr.draw())
 
     def reset_pools():  # (void) -> void
@@ -159,10 +204,10 @@ def arena_draft(hero, card_pool):
                        Rarity.LEGENDARY  # < 100%
                        ],
                   cumsum([
-                         REGULAR_TURN_P[Rarity.COMMON],
-                         REGULAR_TURN_P[Rarity.RARE],
-                         REGULAR_TURN_P[Rarity.EPIC],
-                         REGULAR_TURN_P[Rarity.LEGENDARY]])))
+                         regular_p[Rarity.COMMON],
+                         regular_p[Rarity.RARE],
+                         regular_p[Rarity.EPIC],
+                         regular_p[Rarity.LEGENDARY]])))
     for rarity_p in random.random(REG_N):
         rarity = next(r for (r, w) in iter(norm_z) if rarity_p <= w)
         draft.append([draw_card(rarity) for _ in range(CARDS_PER_PICK)])
@@ -179,9 +224,9 @@ def arena_draft(hero, card_pool):
                        Rarity.LEGENDARY  # < 100%
                        ],
                   cumsum([
-                         SPECIAL_TURN_P[Rarity.RARE],
-                         SPECIAL_TURN_P[Rarity.EPIC],
-                         SPECIAL_TURN_P[Rarity.LEGENDARY]])))
+                         special_p[Rarity.RARE],
+                         special_p[Rarity.EPIC],
+                         special_p[Rarity.LEGENDARY]])))
     for rarity_p in random.random(SPEC_N):
         rarity = next(r for (r, w) in iter(spec_z) if rarity_p <= w)
         draft.append([draw_card(rarity) for _ in range(CARDS_PER_PICK)])
@@ -190,6 +235,10 @@ def arena_draft(hero, card_pool):
     return draft
 
 
+# 1 based pick numbers of the rare or better special picks
+SPECIAL_PICKS = (1, 10, 20, 30)
+
+
 def partition_picks(N):  # (int(1, 30)) -> tuple(int(0,26), int(0,4))
     # the 4 special picks occur on pick 1, 10, 20, 30
     '''
@@ -217,9 +266,21 @@ def p_of_no_cards(T1, S1, P1, T2, S2):
     select U1 with probability P1 or U2 with probability P2 = 1 - P1, and
     randomly pick a ball from the selected urn without replacement. What is the
     probability of selecting 0 red ball in 3 turns?
+    P1 may be a numpy array, in which case an array of probabilities is
+    returned
     '''
     # (int, int, float, int, int, float) -> float(0.0, 1.0)
+    with timing.phase("arena.p_of_no_cards"):
+        return _p_of_no_cards(_no_card_terms(T1, S1, T2, S2), P1)
+
 
+def _no_card_terms(T1, S1, T2, S2):
+    # (int, int, int, int) -> tuple(float, 4)
+    '''
+    Returns the probabilities of 0 red balls for each urn arrangement of
+    p_of_no_cards: (111, 112, 122, 222). These only depend on the urn
+    contents, so they can be reused across any number of values of P1
+    '''
     # probability of picking k succeses in N draws with n/M successes
     def hyper(M, n, N, k):
         # no successes? probability of 0 cards is 1.0!
@@ -234,6 +295,11 @@ def p_of_no_cards(T1, S1, P1, T2, S2):
     u1_p2_u2_p1 = (hyper(M=T1, n=S1, N=2, k=0) * (T2 - S2) / T2)
     u2_p2_u1_p1 = (hyper(M=T2, n=S2, N=2, k=0) * (T1 - S1) / T1)
     u2_p3 = hyper(M=T2, n=S2, N=3, k=0)
+    return (u1_p3, u1_p2_u2_p1, u2_p2_u1_p1, u2_p3)
+
+
+def _p_of_no_cards(terms, P1):
+    u1_p3, u1_p2_u2_p1, u2_p2_u1_p1, u2_p3 = terms
     # the combs are the number of ways to arrange the urns
     # such that each arrangement is identifiable
     P2 = 1.0 - P1
@@ -253,61 +319,286 @@ def p_of_at_least_one_card(T1, S1, P1, T2, S2):
     return 1.0 - p_of_no_cards(T1, S1, P1, T2, S2)
 
 
-def p_of_successful_turn(hero, predicate, card_pool=draftable_cards()):
+def p_of_successful_turn(hero, predicate, card_pool=None,
+                         hero_p=None):
+    # card_pool defaults to draftable_cards(), hero_p to HERO_CARD_P
+    if card_pool is None:
+        card_pool = draftable_cards()
+    hero_p = HERO_CARD_P if hero_p is None else hero_p
     hero_pool = [c for c in card_pool if c.hero == hero]
     neutral_pool = [c for c in card_pool if c.hero is None]
     hero_by = partition_by_rarity(hero_pool)
     neut_by = partition_by_rarity(neutral_pool)
     return lambda m: clip(sum([p * p_of_at_least_one_card(len(hero_by[r]),
                           len([c for c in hero_by[r] if predicate(c)]),
-                          HERO_CARD_P[r],
+                          hero_p[r],
                           len(neut_by[r]),
                           len([c for c in neut_by[r] if predicate(c)]))
         for r, p in m.items()]), 0.0, 1.0)
 
 
-def p_of_successful_regular_turn(hero, predicate, card_pool=draftable_cards()):
-    return p_of_successful_turn(hero, predicate, card_pool)(REGULAR_TURN_P)
+def p_of_successful_regular_turn(hero, predicate, card_pool=None,
+                                 regular_p=None, hero_p=None):
+    regular_p = REGULAR_TURN_P if regular_p is None else regular_p
+    return p_of_successful_turn(hero, predicate, card_pool, hero_p)(regular_p)
 
 
-def p_of_successful_special_turn(hero, predicate, card_pool=draftable_cards()):
-    return p_of_successful_turn(hero, predicate, card_pool)(SPECIAL_TURN_P)
+def p_of_successful_special_turn(hero, predicate, card_pool=None,
+                                 special_p=None, hero_p=None):
+    special_p = SPECIAL_TURN_P if special_p is None else special_p
+    return p_of_successful_turn(hero, predicate, card_pool, hero_p)(special_p)
 
 
-def draft_p(hero, predicate, N=30, card_pool=draftable_cards()):
+def draft_p(hero, predicate, N=30, card_pool=None,
+            regular_p=None, special_p=None, hero_p=None):
     # (Hero, ((CardDef) -> bool), int(0,30), list(CardDef)) -> ((int)->float)
     '''
     Returns the probability distribution that the arena draft process generates
     k successful turns with N turns remaining. A turn is considered a succeses
-    if at least one of the three cards satisfies the predicate
+    if at least one of the three cards satisfies the predicate.
+    card_pool defaults to draftable_cards(); regular_p, special_p and hero_p
+    default to REGULAR_TURN_P, SPECIAL_TURN_P and HERO_CARD_P
     '''
+    regular_p = REGULAR_TURN_P if regular_p is None else regular_p
+    special_p = SPECIAL_TURN_P if special_p is None else special_p
     N_REG, N_SPEC = partition_picks(N)
-    p_of_success = p_of_successful_turn(hero, predicate, card_pool)
-    br = binom(N_REG, p=p_of_success(REGULAR_TURN_P))
-    bs = binom(N_SPEC, p=p_of_success(SPECIAL_TURN_P))
+    p_of_success = p_of_successful_turn(hero, predicate, card_pool, hero_p)
+    br = binom(N_REG, p=p_of_success(regular_p))
+    bs = binom(N_SPEC, p=p_of_success(special_p))
     return lambda k: clip(
         sum([br.pmf(k - i) * bs.pmf(i) for i in range(k + 1)]), 0.0, 1.0)
 
 
-def draft_e(hero, predicate, N=30, card_pool=draftable_cards()):
+def draft_e(hero, predicate, N=30, card_pool=None,
+            regular_p=None, special_p=None, hero_p=None):
     '''
     Expected value
     '''
-    p = draft_p(hero, predicate, N, card_pool)
+    p = draft_p(hero, predicate, N, card_pool, regular_p, special_p, hero_p)
     return sum([p(k) * k for k in range(N + 1)])
 
 
-def draft_var(hero, predicate, N=30, card_pool=draftable_cards()):
+def draft_var(hero, predicate, N=30, card_pool=None,
+              regular_p=None, special_p=None, hero_p=None):
     '''
     Variance
     '''
-    p = draft_p(hero, predicate, N, card_pool)
+    p = draft_p(hero, predicate, N, card_pool, regular_p, special_p, hero_p)
     return (sum([p(k) * pow(k, 2) for k in range(N + 1)]) -
-            pow(draft_e(hero, predicate, N, card_pool), 2))
+            pow(draft_e(hero, predicate, N, card_pool,
+                        regular_p, special_p, hero_p), 2))
 
 
-def draft_sd(hero, predicate, N=30, card_pool=draftable_cards()):
+def draft_sd(hero, predicate, N=30, card_pool=None,
+             regular_p=None, special_p=None, hero_p=None):
     '''
     Standard deviation
     '''
-    return sqrt(draft_var(hero, predicate, N, card_pool))
+    return sqrt(draft_var(hero, predicate, N, card_pool,
+                          regular_p, special_p, hero_p))
+
+
+def probability_tables(tables):
+    # (dict or list(dict) or array) -> array(float, (T, 4))
+    '''
+    Converts a rarity probability table such as REGULAR_TURN_P, a list of
+    them, or an array of them with TABLE_RARITIES columns into a 2d array
+    with one row per table. Rarities missing from a dict have probability 0
+    '''
+    if isinstance(tables, dict):
+        tables = [tables]
+    if len(tables) > 0 and isinstance(tables[0], dict):
+        tables = [[t.get(r, 0.0) for r in TABLE_RARITIES] for t in tables]
+    return atleast_2d(asarray(tables, dtype=float))
+
+
+def sweep(hero, predicates, N=30, card_pool=None, regular_p=None,
+          special_p=None, hero_p=None):
+    # (Hero, list((CardDef) -> bool), int(0,30), list(CardDef), tables,
+    #  tables, tables) -> {str: array(float, (T, K))}
+    '''
+    Evaluates the draft statistics of K predicates under T candidate
+    probability tables in one vectorized pass. Each of regular_p, special_p
+    and hero_p is anything probability_tables accepts and defaults to the
+    module constant; tables given as a single row are broadcast against the
+    others. Returns a dict of (T, K) arrays:
+    - p_regular, p_special: probability of a successful regular/special turn
+    - e, var, sd: moments of the number of successful turns in N turns
+    card_pool defaults to draftable_cards()
+    '''
+    if card_pool is None:
+        card_pool = draftable_cards()
+    regular_p = probability_tables(
+        REGULAR_TURN_P if regular_p is None else regular_p)
+    special_p = probability_tables(
+        SPECIAL_TURN_P if special_p is None else special_p)
+    hero_p = probability_tables(HERO_CARD_P if hero_p is None else hero_p)
+    hero_by = partition_by_rarity([c for c in card_pool if c.hero == hero])
+    neut_by = partition_by_rarity([c for c in card_pool if c.hero is None])
+    # terms[:, k, r]: p_of_no_cards terms of predicate k on a rarity r turn
+    terms = zeros((4, len(predicates), len(TABLE_RARITIES)))
+    for k, predicate in enumerate(predicates):
+        for j, r in enumerate(TABLE_RARITIES):
+            terms[:, k, j] = _no_card_terms(
+                len(hero_by[r]), len([c for c in hero_by[r] if predicate(c)]),
+                len(neut_by[r]), len([c for c in neut_by[r] if predicate(c)]))
+    # (T, K, 4) probability of at least one matching card per rarity
+    p_of_success = 1.0 - _p_of_no_cards(terms[:, None],
+                                        hero_p[:, None, :])
+    p_reg = clip((regular_p[:, None, :] * p_of_success).sum(axis=2), 0.0, 1.0)
+    p_spec = clip((special_p[:, None, :] * p_of_success).sum(axis=2),
+                  0.0, 1.0)
+    N_REG, N_SPEC = partition_picks(N)
+    var = N_REG * p_reg * (1.0 - p_reg) + N_SPEC * p_spec * (1.0 - p_spec)
+    return {"p_regular": p_reg,
+            "p_special": p_spec,
+            "e": N_REG * p_reg + N_SPEC * p_spec,
+            "var": var,
+            "sd": sqrt(var)}
+
+
+def successes_pmf(N, p_regular, p_special):
+    # (int(0,30), float, float) -> array(float, N + 1)
+    '''
+    Returns the probability mass function of the number of successful turns
+    in N remaining turns, given the probability of a successful regular turn
+    and of a successful special turn
+    '''
+    N_REG, N_SPEC = partition_picks(N)
+    return clip(convolve(binom(N_REG, p_regular).pmf(arange(N_REG + 1)),
+                         binom(N_SPEC, p_special).pmf(arange(N_SPEC + 1))),
+                0.0, 1.0)
+
+
+def draft_pmf(hero, predicate, N=30, card_pool=None,
+              regular_p=None, special_p=None, hero_p=None):
+    # (Hero, ((CardDef) -> bool), int(0,30), list(CardDef)) -> array(float)
+    '''
+    Returns the array of the probabilities that the arena draft process
+    generates k = 0..N successful turns with N turns remaining, see draft_p.
+    card_pool defaults to draftable_cards()
+    '''
+    if card_pool is None:
+        card_pool = draftable_cards()
+    regular_p = REGULAR_TURN_P if regular_p is None else regular_p
+    special_p = SPECIAL_TURN_P if special_p is None else special_p
+    p_of_success = p_of_successful_turn(hero, predicate, card_pool, hero_p)
+    return successes_pmf(N, p_of_success(regular_p), p_of_success(special_p))
+
+
+class DraftNeed(object):
+    '''
+    A deck building goal scored by DraftSession: having up to target cards
+    satisfying predicate in the final deck, each worth weight
+    '''
+    def __init__(self, predicate, target, weight=1.0):
+        self.predicate = predicate
+        self.target = target
+        self.weight = weight
+
+
+class DraftSession(object):
+    '''
+    DraftSession advises the picks of a live arena draft. On creation it
+    computes, for every need and every number of remaining picks, the
+    expected number of cards satisfying the need in the final deck (capped
+    at the need's target) given how many the deck already has. The
+    distribution of future successful turns comes from partition_picks and
+    p_of_successful_turn, assuming a future turn offering a matching card
+    is picked for the need. Scoring an offer and making a pick are then
+    table lookups
+    '''
+    N = 30
+
+    def __init__(self, hero, needs, card_pool=None, picks=()):
+        # (Hero, {str: DraftNeed}, list(CardDef), list(CardDef))
+        # card_pool defaults to draftable_cards()
+        if card_pool is None:
+            card_pool = draftable_cards()
+        self.hero = hero
+        self.names = list(needs)
+        self.needs = [needs[name] for name in self.names]
+        self.picks = []
+        self._weights = array([n.weight for n in self.needs])
+        self._hits = {c.id: self._match(c) for c in card_pool}
+        K = len(self.needs)
+        # _value[k, R, c]: E[min(c + successes in R turns, target_k)]
+        self._value = zeros((K, self.N, self.N + 1))
+        counts = arange(self.N + 1)
+        for k, need in enumerate(self.needs):
+            p_of_success = p_of_successful_turn(hero, need.predicate,
+                                                card_pool)
+            p_reg = p_of_success(REGULAR_TURN_P)
+            p_spec = p_of_success(SPECIAL_TURN_P)
+            for R in range(self.N):
+                pmf = successes_pmf(R, p_reg, p_spec)
+                capped = minimum(counts[:, None] + arange(R + 1), need.target)
+                self._value[k, R] = capped.dot(pmf)
+        self._counts = zeros(K, dtype=int)
+        for card in picks:
+            self.pick(card)
+
+    def _match(self, card):
+        # CardDef -> array(int, K)
+        return array([1 if n.predicate(card) else 0 for n in self.needs])
+
+    def _hits_of(self, card):
+        # CardDef -> array(int, K)
+        hits = self._hits.get(card.id, None)
+        return self._match(card) if hits is None else hits
+
+    @property
+    def remaining(self):
+        # (void) -> int
+        '''
+        number of picks left to make, including the current one
+        '''
+        return self.N - len(self.picks)
+
+    def expected_deck(self, card=None):
+        # CardDef -> {str: float}
+        '''
+        Returns the expected number of cards satisfying each need in the
+        final deck, capped at the need's target, if card is picked now. With
+        card=None the current pick is assumed to satisfy no need
+        '''
+        return dict(zip(self.names, map(float, self._expected(card))))
+
+    def _expected(self, card):
+        # CardDef -> array(float, K)
+        if self.remaining <= 0:
+            raise ValueError("the draft is complete")
+        counts = self._counts
+        if card is not None:
+            counts = counts + self._hits_of(card)
+        R = self.remaining - 1
+        K = len(self.needs)
+        return self._value[arange(K), R, minimum(counts, self.N)]
+
+    def score(self, offered):
+        # list(CardDef) -> list(float)
+        '''
+        Returns the weighted gain in expected final deck value of picking
+        each of the offered cards, relative to a pick satisfying no need
+        '''
+        base = self._weights.dot(self._expected(None))
+        return [float(self._weights.dot(self._expected(c)) - base)
+                for c in offered]
+
+    def best(self, offered):
+        # list(CardDef) -> CardDef
+        '''
+        Returns the offered card with the highest score
+        '''
+        scores = self.score(offered)
+        return offered[scores.index(max(scores))]
+
+    def pick(self, card):
+        # CardDef -> void
+        '''
+        Records card as the current pick
+        '''
+        if self.remaining <= 0:
+            raise ValueError("the draft is complete")
+        self.picks.append(card)
+        self._counts = self._counts + self._hits_of(card)
@@ -0,0 +1,163 @@
+import hashlib
+import os
+from collections import OrderedDict
+from numpy import arange, load, packbits, save, sqrt
+from . import arena
+
+
+'''
+cache module for reusing the arena draft distributions of repeated
+(hero, N, card pool, predicate) queries
+'''
+
+
+def pool_fingerprint(card_pool):
+    # list(CardDef) -> str
+    '''
+    Returns a digest of the id, class and rarity of the cards of card_pool,
+    in order: the fields draft_pmf depends on besides the predicate
+    '''
+    h = hashlib.sha1()
+    for card in card_pool:
+        h.update('{0}\0{1}\0{2}\0'.format(
+            card.id, _int_or_none(card.hero),
+            _int_or_none(card.rarity)).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _int_or_none(value):
+    return None if value is None else int(value)
+
+
+def predicate_fingerprint(predicate, card_pool):
+    # (((CardDef) -> bool), list(CardDef)) -> str
+    '''
+    Returns a digest of the result of predicate over card_pool. Two
+    predicates selecting the same cards of the pool share a digest
+    '''
+    mask = packbits([bool(predicate(c)) for c in card_pool])
+    return hashlib.sha1(mask.tobytes()).hexdigest()
+
+
+def _table_key(table):
+    # {Rarity: float} -> tuple
+    return tuple(sorted((int(r), float(p)) for r, p in table.items()))
+
+
+class DraftCache(object):
+    '''
+    DraftCache memoizes the probability mass function of arena.draft_pmf in
+    a bounded LRU keyed by (hero, N, pool fingerprint, predicate fingerprint,
+    probability tables). With a directory, evicted and new entries are also
+    kept on disk as .npy files so they survive restarts and can be shared
+    by processes. The moments and tail probabilities are computed from the
+    cached PMF so they never redo the convolution
+    '''
+    def __init__(self, maxsize=1024, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        if directory is not None and not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def key(self, hero, predicate, N=30, card_pool=None, regular_p=None,
+            special_p=None, hero_p=None):
+        # (...) -> str
+        '''
+        Returns the cache key of a draft_pmf query
+        '''
+        card_pool = arena.draftable_cards() if card_pool is None else card_pool
+        tables = tuple(_table_key(t) for t in (
+            arena.REGULAR_TURN_P if regular_p is None else regular_p,
+            arena.SPECIAL_TURN_P if special_p is None else special_p,
+            arena.HERO_CARD_P if hero_p is None else hero_p))
+        # recomputed every query: a pool list may be changed in place, and
+        # this costs about as much as the predicate fingerprint
+        parts = (int(hero), N, pool_fingerprint(card_pool),
+                 predicate_fingerprint(predicate, card_pool), tables)
+        return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+    def pmf(self, hero, predicate, N=30, card_pool=None, regular_p=None,
+            special_p=None, hero_p=None):
+        # (...) -> array(float, N + 1)
+        '''
+        Returns the read only arena.draft_pmf array of the query, computing
+        it only if neither the memory nor the disk tier holds it
+        '''
+        card_pool = arena.draftable_cards() if card_pool is None else card_pool
+        k = self.key(hero, predicate, N, card_pool,
+                     regular_p, special_p, hero_p)
+        pmf = self._lru.get(k, None)
+        if pmf is not None:
+            self._lru.move_to_end(k)
+            self.hits += 1
+            return pmf
+        pmf = self._load(k)
+        if pmf is None:
+            self.misses += 1
+            pmf = arena.draft_pmf(hero, predicate, N, card_pool,
+                                  regular_p, special_p, hero_p)
+            self._store(k, pmf)
+        else:
+            self.hits += 1
+        pmf.flags.writeable = False
+        self._lru[k] = pmf
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+        return pmf
+
+    def _path(self, k):
+        return os.path.join(self.directory, k + ".npy")
+
+    def _load(self, k):
+        if self.directory is None or not os.path.exists(self._path(k)):
+            return None
+        return load(self._path(k))
+
+    def _store(self, k, pmf):
+        if self.directory is None:
+            return
+        # write then rename so readers never see a partial file
+        tmp = self._path(k) + ".{0}.tmp".format(os.getpid())
+        with open(tmp, 'wb') as f:
+            save(f, pmf)
+        os.replace(tmp, self._path(k))
+
+    def draft_p(self, hero, predicate, N=30, card_pool=None, **tables):
+        # (...) -> ((int) -> float)
+        pmf = self.pmf(hero, predicate, N, card_pool, **tables)
+        return lambda k: pmf[k] if 0 <= k < len(pmf) else 0.0
+
+    def draft_e(self, hero, predicate, N=30, card_pool=None, **tables):
+        pmf = self.pmf(hero, predicate, N, card_pool, **tables)
+        return float(pmf.dot(arange(len(pmf))))
+
+    def draft_var(self, hero, predicate, N=30, card_pool=None, **tables):
+        pmf = self.pmf(hero, predicate, N, card_pool, **tables)
+        k = arange(len(pmf))
+        return float(pmf.dot(k * k) - pow(pmf.dot(k), 2))
+
+    def draft_sd(self, hero, predicate, N=30, card_pool=None, **tables):
+        return float(sqrt(self.draft_var(hero, predicate, N, card_pool,
+                                         **tables)))
+
+    def draft_at_least(self, hero, predicate, k, N=30, card_pool=None,
+                       **tables):
+        # (...) -> float
+        '''
+        Probability of at least k successful turns
+        '''
+        pmf = self.pmf(hero, predicate, N, card_pool, **tables)
+        return float(pmf[max(k, 0):].sum())
+
+    def clear(self):
+        # (void) -> void
+        '''
+        Empties the memory tier. The disk tier is left untouched
+        '''
+        self._lru.clear()
+
+    def __len__(self):
+        return len(self._lru)
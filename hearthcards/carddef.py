@@ -1,100 +1,220 @@
 import shutil
+import sys
 import tempfile
 import xml.etree.ElementTree as ET
 import os
+from array import array
+from collections.abc import Mapping
 from enum import Enum
-from . import disunity
+from . import disunity, timing
 from .tags import (GameTag, CardSet, CardType, Hero,
                    Faction, CardRace, Rarity,
-                   Requirement, Mechanics)
+                   Requirement, MechanicBits, requirement_bit)
 from .util import hearthstone_data_dir
 from .locale import Locale
 
 
+class TagRow(Mapping):
+    '''
+    Read only {GameTag: value} mapping holding its values in a tuple. The
+    {GameTag: index} dict of keys is shared by every TagRow with the same
+    keys in the same order, which is most cards
+    '''
+    __slots__ = ('_keys', '_values')
+
+    # key tuple -> shared {GameTag: index} dict, see layout
+    _layouts = {}
+
+    def __init__(self, keys, values):
+        self._keys = TagRow.layout(keys)
+        self._values = values
+
+    @classmethod
+    def layout(cls, keys):
+        # tuple(GameTag) -> {GameTag: int}
+        layout = cls._layouts.get(keys, None)
+        if layout is None:
+            layout = cls._layouts[keys] = {k: i for i, k in enumerate(keys)}
+        return layout
+
+    @classmethod
+    def freeze(cls, tags):
+        # {GameTag: object} -> TagRow
+        return cls(tuple(tags), tuple(tags.values()))
+
+    def __getitem__(self, key):
+        return self._values[self._keys[key]]
+
+    def get(self, key, default=None):
+        i = self._keys.get(key, None)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class CardRecord(object):
+    '''
+    Locale independent portion of a Hearthstone card definition. A single
+    CardRecord is shared by the CardDef views of every locale
+    '''
+    __slots__ = ('id', 'tags', 'referenced_tags', 'play_requirements',
+                 'entourage_cards', 'power_history_info', 'mechanics',
+                 'power_definition', 'master_power', 'mechanics_mask',
+                 'requirements_mask')
+
+    def __init__(self, card_id):
+        self.id = card_id
+        self.tags = {}
+        self.referenced_tags = {}
+        self.play_requirements = {}
+        self.entourage_cards = []
+        self.power_history_info = {}
+        self.mechanics = []
+        self.power_definition = None
+        self.master_power = None
+        self.mechanics_mask = 0
+        self.requirements_mask = 0
+
+
+def read_entity(entity_el, strings_only=False):
+    # (Element, bool) -> (CardRecord, {GameTag: str})
+    '''
+    Reads an Entity xml element into a CardRecord holding the locale
+    independent data and a dict of the String tags (name, text, flavor,
+    artist) for the locale of the xml file. With strings_only=True only
+    the String tags are read and the returned CardRecord is None
+    '''
+    strings = {}
+    if strings_only:
+        for el in entity_el.iter('Tag'):
+            if el.attrib.get("type", None) == 'String':
+                enum_id = el.attrib.get("enumID", None)
+                strings[GameTag(_to_int_or_none(enum_id))] = el.text
+        timing.count("card_def.strings")
+        return None, strings
+
+    record = CardRecord(entity_el.attrib["CardID"])
+
+    def read_tag(el):
+        enum_id = el.attrib.get("enumID", None)
+        tag = GameTag(_to_int_or_none(enum_id))
+        t = el.attrib.get("type", None)
+        if t == 'String':
+            strings[tag] = el.text
+        else:
+            value = _to_int_or_none(el.attrib.get("value", None))
+            record.tags[tag] = value
+            # check if the tag is a mechanic
+            if tag in MechanicBits:
+                record.mechanics.append(tag)
+                record.mechanics_mask |= MechanicBits[tag]
+
+    def read_referenced_tag(el):
+        enum_id = el.attrib.get("enumID", None)
+        tag = GameTag(_to_int_or_none(enum_id))
+        value = _to_int_or_none(el.attrib.get("value", None))
+        record.referenced_tags[tag] = value
+
+    def read_master_power(el):
+        record.master_power = el.text
+
+    def read_power(el):
+        record.power_definition = el.attrib.get("definition", None)
+
+    def read_play_requirement(el):
+        enum_id = el.attrib.get("reqID", None)
+        req = _to_enum_or_none(Requirement, enum_id)
+        if req is not None:
+            param = _to_int_or_none(el.attrib.get("param", None))
+            record.play_requirements[req] = param or 0
+            record.requirements_mask |= requirement_bit(req)
+
+    def read_entourage_card(el):
+        record.entourage_cards.append(el.attrib["cardID"])
+
+    def read_triggered_power_history_info(el):
+        effect_index = _to_int_or_none(el.attrib.get("effectIndex", None))
+        if effect_index is not None:
+            show = bool(el.attrib.get("showInHistory", False))
+            record.power_history_info[effect_index] = show
+
+    reader = {
+        'Tag': read_tag,
+        'ReferencedTag': read_referenced_tag,
+        'MasterPower': read_master_power,
+        'Power': read_power,
+        'EntourageCard': read_entourage_card,
+        'PlayRequirement': read_play_requirement,
+        'TriggeredPowerHistoryInfo': read_triggered_power_history_info,
+    }
+    for el in entity_el.iter():
+        action = reader.get(el.tag, lambda x: None)
+        action(el)
+    record.tags = TagRow.freeze(record.tags)
+    record.referenced_tags = TagRow.freeze(record.referenced_tags)
+    timing.count("card_def.records")
+    return record, strings
+
+
+# get_tag default telling a missing String tag from one whose value is None
+_NOT_A_STRING = object()
+
+
 class CardDef(object):
     '''
-    Hearthstone card definition
+    Hearthstone card definition. A CardDef is a thin view pairing a shared
+    CardRecord with the String tags of a single locale
     '''
+    __slots__ = ('_record', '_strings', '_store', '_locale', '_entourage')
+
     def __init__(self, entity_el):
         '''
         constructs a CardDef from an Entity xml element
         - el is a single ElementTree.Element object with an Entity tag
         from one of the language specific Hearthstone card xml files
         '''
-        self._tags = {}
-        self._referenced_tags = {}
-        self._play_requirements = {}
-        self._entourage_cards = []
-        self._power_history_info = {}
-        self._mechanics = []
-        self._power_definition = None
-
-        def is_mechanic(t):
-            return t in Mechanics
-
-        def read_tag(el):
-            enum_id = el.attrib.get("enumID", None)
-            tag = GameTag(_to_int_or_none(enum_id))
-            t = el.attrib.get("type", None)
-            if t == 'String':
-                self._tags[tag] = el.text
-            else:
-                value = _to_int_or_none(el.attrib.get("value", None))
-                self._tags[tag] = value
-                # check if the tag is a mechanic
-                if is_mechanic(tag):
-                    self._mechanics.append(tag)
-
-        def read_referenced_tag(el):
-            enum_id = el.attrib.get("enumID", None)
-            tag = GameTag(_to_int_or_none(enum_id))
-            value = _to_int_or_none(el.attrib.get("value", None))
-            self._referenced_tags[tag] = value
-
-        def read_master_power(el):
-            self.master_power = el.text
-
-        def read_power(el):
-            self._power_definition = el.attrib.get("definition", None)
-
-        def read_play_requirement(el):
-            enum_id = el.attrib.get("reqID", None)
-            req = _to_enum_or_none(Requirement, enum_id)
-            if req is not None:
-                param = _to_int_or_none(el.attrib.get("param", None))
-                self._play_requirements[req] = param or 0
-
-        def read_entourage_card(el):
-            self._entourage_cards.append(el.attrib["cardID"])
-
-        def read_triggered_power_history_info(el):
-            effect_index = _to_int_or_none(el.attrib.get("effectIndex", None))
-            if effect_index is not None:
-                show = bool(el.attrib.get("showInHistory", False))
-                self._power_history_info[effect_index] = show
-
-        reader = {
-            'Tag': read_tag,
-            'ReferencedTag': read_referenced_tag,
-            'MasterPower': read_master_power,
-            'Power': read_power,
-            'EntourageCard': read_entourage_card,
-            'PlayRequirement': read_play_requirement,
-            'TriggeredPowerHistoryInfo': read_triggered_power_history_info,
-        }
-        for el in entity_el.iter():
-            action = reader.get(el.tag, lambda x: None)
-            action(el)
+        self._record, self._strings = read_entity(entity_el)
+        self._store = None
+        self._locale = None
+        self._entourage = None
+
+    @classmethod
+    def view(cls, record, strings, store=None, locale=None):
+        # (CardRecord, {GameTag: str}, CardStore, Locale) -> CardDef
+        '''
+        constructs a CardDef view over an existing CardRecord and the
+        String tags of one locale without copying either. Views belonging
+        to a CardStore resolve their entourage cards through it
+        '''
+        card = cls.__new__(cls)
+        card._record = record
+        card._strings = strings
+        card._store = store
+        card._locale = locale
+        card._entourage = None
+        return card
 
-        self._id = entity_el.attrib["CardID"]
+    @property
+    def record(self):
+        return self._record
 
     @property
     def id(self):
-        return self._id
+        return self._record.id
 
     @property
     def name(self):
-        return self._tags[GameTag.CARDNAME]
+        return self._strings[GameTag.CARDNAME]
 
     @property
     def type(self):
@@ -170,19 +290,40 @@ class CardDef(object):
 
     @property
     def entourage_cards(self):
-        return self._entourage_cards
+        return self._record.entourage_cards
+
+    @property
+    def entourage(self):
+        '''
+        entourage_cards resolved to CardDef objects of the same locale.
+        Resolved on first access; ids unknown to the owning CardStore are
+        skipped and a CardDef built directly from xml resolves to []
+        '''
+        if self._entourage is None:
+            if self._store is None:
+                self._entourage = []
+            else:
+                get = self._store.get
+                resolved = (get(card_id, self._locale)
+                            for card_id in self._record.entourage_cards)
+                self._entourage = [c for c in resolved if c is not None]
+        return self._entourage
 
     @property
     def power_definition(self):
-        return self._power_definition
+        return self._record.power_definition
+
+    @property
+    def master_power(self):
+        return self._record.master_power
 
     @property
     def play_requirements(self):
-        return self._play_requirements
+        return self._record.play_requirements
 
     @property
     def mechanics(self):
-        return self._mechanics
+        return self._record.mechanics
 
     @property
     def is_weapon(self):
@@ -215,16 +356,23 @@ class CardDef(object):
             base_uri, locale.value.lower(), self.id)
 
     def has_tag(self, game_tag):
-        return game_tag in self._tags
+        return game_tag in self._strings or game_tag in self._record.tags
 
     def get_tag(self, game_tag):
-        return self._tags.get(game_tag, None)
+        value = self._strings.get(game_tag, _NOT_A_STRING)
+        if value is _NOT_A_STRING:
+            return self._record.tags.get(game_tag, None)
+        return value
+
+    def has_mechanic(self, mechanic):
+        return bool(self._record.mechanics_mask &
+                    MechanicBits.get(mechanic, 0))
 
     def has_requirement(self, req):
-        return req in self._play_requirements
+        return bool(self._record.requirements_mask & requirement_bit(req))
 
     def get_requirement(self, req):
-        return self._play_requirements.get(req, None)
+        return self._record.play_requirements.get(req, None)
 
     def repr(self, locale):
         return {
@@ -276,11 +424,229 @@ class CardDef(object):
 UNITY3D_CARDXML = os.path.join(hearthstone_data_dir(), "cardxml0.unity3d")
 
 
-def card_db(cardxml_unity3d=UNITY3D_CARDXML):
-    # Path -> {Lang: List(CardDef)}
+class StringTable(Mapping):
+    '''
+    The String tags of every card of one locale, as a card id ->
+    {GameTag: str} mapping. Rather than a dict per card, the strings of all
+    cards are kept in a single list, and each card position of the owning
+    CardStore holds the index of its first string and of its key layout
+    '''
+    def __init__(self, ids, positions):
+        # (list(str), {str: int}) shared with the CardStore
+        self._ids = ids
+        self._positions = positions
+        self._order = array('l')
+        self._first = array('l')
+        self._layout = array('l')
+        self._layouts = []
+        self._layout_index = {}
+        self._values = []
+
+    def add(self, card_id, strings):
+        # (str, {GameTag: str}) -> void
+        position = self._positions[card_id]
+        missing = position + 1 - len(self._first)
+        if missing > 0:
+            self._first.extend([-1] * missing)
+            self._layout.extend([0] * missing)
+        if self._first[position] < 0:
+            self._order.append(position)
+        keys = tuple(strings)
+        layout = self._layout_index.get(keys, None)
+        if layout is None:
+            layout = self._layout_index[keys] = len(self._layouts)
+            self._layouts.append(TagRow.layout(keys))
+        self._first[position] = len(self._values)
+        self._layout[position] = layout
+        # strings repeated across locales, e.g. artist names, are kept once
+        self._values.extend(v if v is None else sys.intern(v)
+                            for v in strings.values())
+
+    def _row(self, position):
+        # int -> StringTags
+        return StringTags(self._layouts[self._layout[position]],
+                          self._values, self._first[position])
+
+    def __getitem__(self, card_id):
+        position = self._positions.get(card_id, len(self._first))
+        if position >= len(self._first) or self._first[position] < 0:
+            raise KeyError(card_id)
+        return self._row(position)
+
+    def __contains__(self, card_id):
+        position = self._positions.get(card_id, len(self._first))
+        return position < len(self._first) and self._first[position] >= 0
+
+    def __iter__(self):
+        ids = self._ids
+        return (ids[p] for p in self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    def items(self):
+        ids = self._ids
+        return [(ids[p], self._row(p)) for p in self._order]
+
+
+class StringTags(Mapping):
+    '''
+    Read only {GameTag: str} view of the strings of one card of a
+    StringTable
+    '''
+    __slots__ = ('_keys', '_values', '_first')
+
+    def __init__(self, keys, values, first):
+        self._keys = keys
+        self._values = values
+        self._first = first
+
+    def __getitem__(self, key):
+        return self._values[self._first + self._keys[key]]
+
+    def get(self, key, default=None):
+        i = self._keys.get(key, None)
+        return default if i is None else self._values[self._first + i]
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class CardStore(object):
+    '''
+    Deduplicated card storage. Holds a single CardRecord per card id with the
+    locale independent data, plus a StringTable of String tags per locale.
+    CardDef objects handed out by the store are views over both.
+    search_indices maps a locale to a search.SearchIndex of its cards; the
+    columnar module saves and loads the indices with the store
+    '''
+    def __init__(self):
+        self.records = {}
+        self.strings = {}
+        self.search_indices = {}
+        self._ids = []
+        self._positions = {}
+        self._views = {}
+        self._names = {}
+
+    def add_locale(self, locale, entities):
+        # (Locale, iterable(Element)) -> void
+        '''
+        adds the Entity elements of a locale specific card xml file. Records
+        are only read for card ids not seen in a previously added locale
+        '''
+        def rows():
+            for el in entities:
+                card_id = el.attrib["CardID"]
+                record, strings = read_entity(
+                    el, strings_only=card_id in self.records)
+                yield card_id, record, strings
+        self.add_cards(locale, rows())
+
+    def add_cards(self, locale, rows):
+        # (Locale, iterable(tuple(str, CardRecord, {GameTag: str}))) -> void
+        '''
+        adds the cards of a locale given as (card id, record, String tags).
+        The record is only used for card ids not seen before and may be None
+        for the others
+        '''
+        table = StringTable(self._ids, self._positions)
+        for card_id, record, strings in rows:
+            if card_id not in self.records:
+                self.records[card_id] = record
+                self._positions[card_id] = len(self._ids)
+                self._ids.append(card_id)
+            table.add(card_id, strings)
+        self.strings[locale] = table
+        self.search_indices.pop(locale, None)
+        self._views.pop(locale, None)
+        self._names.pop(locale, None)
+
+    @property
+    def locales(self):
+        return list(self.strings.keys())
+
+    def cards(self, locale):
+        # Locale -> list(CardDef)
+        '''
+        Returns CardDef views of every card with strings in the locale
+        '''
+        return list(self._id_index(locale).values())
+
+    def get(self, card_id, locale=Locale.US):
+        # (str, Locale) -> CardDef or None
+        '''
+        Returns the CardDef with the given id in the locale or None
+        '''
+        return self._id_index(locale).get(card_id, None)
+
+    def find(self, name, locale=Locale.US):
+        # (str, Locale) -> list(CardDef)
+        '''
+        Returns the CardDefs whose name in the locale matches name,
+        ignoring case. Several cards can share a name, e.g. a minion
+        and the enchantment it applies
+        '''
+        return list(self._name_index(locale).get(name.casefold(), ()))
+
+    def _id_index(self, locale):
+        # Locale -> {str: CardDef}
+        '''
+        Lazily builds the id -> CardDef hash index of a locale. The views are
+        built once so that repeated lookups return the same objects
+        '''
+        try:
+            return self._views[locale]
+        except KeyError:
+            records = self.records
+            index = {card_id: CardDef.view(records[card_id], strings,
+                                           self, locale)
+                     for card_id, strings in self.strings[locale].items()}
+            self._views[locale] = index
+            return index
+
+    def _name_index(self, locale):
+        # Locale -> {str: list(CardDef)}
+        '''
+        Lazily builds the case folded name -> list(CardDef) index of a locale
+        '''
+        try:
+            return self._names[locale]
+        except KeyError:
+            index = {}
+            for card in self._id_index(locale).values():
+                name = card.get_tag(GameTag.CARDNAME)
+                if name is not None:
+                    index.setdefault(name.casefold(), []).append(card)
+            self._names[locale] = index
+            return index
+
+    def __contains__(self, card_id):
+        return card_id in self.records
+
+    def as_dict(self):
+        # (void) -> {Locale: list(CardDef)}
+        return {locale: self.cards(locale) for locale in self.strings}
+
+    def __len__(self):
+        return len(self.records)
+
+
+def card_store(cardxml_unity3d=UNITY3D_CARDXML):
+    # Path -> CardStore
     '''
     Extracts the card data from the unity3d cardxml file using disunity and
-    returns a dict of Lang to list of CardDef objects
+    returns a CardStore sharing the locale independent data of each card
+    across all of the locales
     '''
     with tempfile.TemporaryDirectory() as tmp_dir:
         # copy the cards xml unity3d file to a temp directory
@@ -288,19 +654,36 @@ def card_db(cardxml_unity3d=UNITY3D_CARDXML):
         if not os.path.exists(cardxml_unity3d):
             raise IOError("Cannot find file " + cardxml_unity3d)
         dst = os.path.join(tmp_dir, filename)
-        shutil.copyfile(cardxml_unity3d, dst)
+        with timing.phase("card_db.copy"):
+            shutil.copyfile(cardxml_unity3d, dst)
         # run disunity extract on the tmp cardxml0.unity3d file
-        disunity.extract(dst)
-        # build the dict
+        with timing.phase("card_db.extract"):
+            disunity.extract(dst)
+        # build the store
         xml_files_dir = os.path.join(
             tmp_dir, "cardxml0", "CAB-cardxml0", "TextAsset")
         if not os.path.exists(xml_files_dir):
             raise IOError(
                 "disunity extract failed, cannot find temporary directory @ "
                 + xml_files_dir)
-        return {Locale(os.path.splitext(file)[0]):
-                card_defs_from_xml(os.path.join(xml_files_dir, file))
-                for file in os.listdir(xml_files_dir)}
+        store = CardStore()
+        for file in sorted(os.listdir(xml_files_dir)):
+            locale = Locale(os.path.splitext(file)[0])
+            with timing.phase("card_db.parse." + locale.value):
+                root = ET.parse(os.path.join(xml_files_dir, file)).getroot()
+            with timing.phase("card_db.read." + locale.value):
+                store.add_locale(locale, root.iter('Entity'))
+        return store
+
+
+def card_db(cardxml_unity3d=UNITY3D_CARDXML):
+    # Path -> {Lang: List(CardDef)}
+    '''
+    Extracts the card data from the unity3d cardxml file using disunity and
+    returns a dict of Lang to list of CardDef objects. The CardDef objects
+    of every locale share their locale independent data, see CardStore
+    '''
+    return card_store(cardxml_unity3d).as_dict()
 
 
 def card_defs_from_xml(xmlfile):
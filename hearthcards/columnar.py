@@ -0,0 +1,529 @@
+from collections.abc import Mapping, Sequence
+from numpy import (arange, argsort, array, asarray, bool_, bytes_, cumsum,
+                   diff, frombuffer, full, int32, int64, load as np_load,
+                   nonzero, repeat, savez, savez_compressed, searchsorted,
+                   uint8, uint32, zeros)
+from .carddef import CardDef, CardRecord, CardStore, TagRow
+from .locale import Locale
+from .search import SearchIndex
+from .tags import GameTag, Requirement
+
+
+'''
+columnar module for storing a CardStore as flat numpy arrays:
+- every string (card ids, card text, entourage ids, powers) lives once in
+the "text" table: a utf-8 "text.blob" plus "text.offsets" with the start of
+each string and the end of the last. Other arrays refer to strings by index
+into the table, -1 standing for None
+- per card lists (tags, mechanics, play requirements, ...) are stored CSR
+style: "<field>.offsets" with len(cards) + 1 entries into the value arrays
+- each locale's string tags are stored as "strings.<locale>.*", in the
+order the locale lists its cards
+- "ids.sorted" holds the utf-8 card ids in sorted order and "ids.order"
+the matching card indices, for binary search
+- the search indices of the store are stored as "search.<locale>.*": the
+arrays of SearchIndex.to_arrays plus "search.<locale>.ids", the card
+index of each of its card numbers
+The arrays can be written to a .npz file with save and read back with load,
+or served without building a CardRecord per card by ArrayCardStore
+'''
+
+
+class _TextTable(object):
+    '''
+    Builds the deduplicated string table
+    '''
+    def __init__(self):
+        self.index = {}
+        self.strings = []
+
+    def ref(self, s):
+        # str -> int
+        if s is None:
+            return -1
+        i = self.index.get(s, None)
+        if i is None:
+            i = self.index[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    def arrays(self):
+        # (void) -> (array(uint8), array(int64))
+        encoded = [s.encode('utf-8') for s in self.strings]
+        offsets = zeros(len(encoded) + 1, dtype=int64)
+        offsets[1:] = cumsum([len(b) for b in encoded])
+        return frombuffer(b''.join(encoded), dtype=uint8), offsets
+
+
+def text_at(arrays, i):
+    # (mapping, int) -> str or None
+    '''
+    Returns string i of the text table of arrays
+    '''
+    if i < 0:
+        return None
+    offsets = arrays["text.offsets"]
+    start, end = int(offsets[i]), int(offsets[i + 1])
+    return arrays["text.blob"][start:end].tobytes().decode('utf-8')
+
+
+def _csr(rows, dtypes):
+    # (list(list(tuple)), tuple(dtype)) -> (array(int64), arrays...)
+    offsets = zeros(len(rows) + 1, dtype=int64)
+    offsets[1:] = cumsum([len(r) for r in rows])
+    flat = [item for r in rows for item in r]
+    columns = [asarray([item[j] for item in flat], dtype=dtype)
+               for j, dtype in enumerate(dtypes)]
+    return [offsets] + columns
+
+
+def to_arrays(store):
+    # CardStore -> {str: array}
+    '''
+    Returns the flat array representation of store described in the
+    module docstring
+    '''
+    text = _TextTable()
+    records = list(store.records.values())
+    position = {r.id: i for i, r in enumerate(records)}
+    a = {}
+    a["ids"] = asarray([text.ref(r.id) for r in records], dtype=int32)
+    encoded = array([r.id.encode('utf-8') for r in records], dtype=bytes_)
+    a["ids.order"] = asarray(argsort(encoded, kind='stable'), dtype=int32)
+    a["ids.sorted"] = encoded[a["ids.order"]]
+
+    def nullable(v):
+        return (0, True) if v is None else (v, False)
+
+    a["tags.offsets"], a["tags.keys"], a["tags.values"], a["tags.null"] = \
+        _csr([[(int(k),) + nullable(v) for k, v in r.tags.items()]
+              for r in records], (int32, int64, bool_))
+    (a["referenced_tags.offsets"], a["referenced_tags.keys"],
+     a["referenced_tags.values"], a["referenced_tags.null"]) = \
+        _csr([[(int(k),) + nullable(v)
+               for k, v in r.referenced_tags.items()] for r in records],
+             (int32, int64, bool_))
+    a["mechanics.offsets"], a["mechanics.values"] = \
+        _csr([[(int(m),) for m in r.mechanics] for r in records], (int32,))
+    (a["play_requirements.offsets"], a["play_requirements.keys"],
+     a["play_requirements.values"]) = \
+        _csr([[(int(k), v) for k, v in r.play_requirements.items()]
+              for r in records], (int32, int64))
+    a["entourage_cards.offsets"], a["entourage_cards.values"] = \
+        _csr([[(text.ref(e),) for e in r.entourage_cards]
+              for r in records], (int32,))
+    (a["power_history_info.offsets"], a["power_history_info.keys"],
+     a["power_history_info.values"]) = \
+        _csr([[(k, v) for k, v in r.power_history_info.items()]
+              for r in records], (int64, bool_))
+    a["power_definition"] = asarray(
+        [text.ref(r.power_definition) for r in records], dtype=int32)
+    a["master_power"] = asarray(
+        [text.ref(r.master_power) for r in records], dtype=int32)
+    a["mechanics_mask"] = asarray([r.mechanics_mask for r in records],
+                                  dtype=uint32)
+    a["requirements_mask"] = asarray([r.requirements_mask for r in records],
+                                     dtype=int64)
+    locales = store.locales
+    a["locales"] = array([loc.value for loc in locales])
+    for loc in locales:
+        table = store.strings[loc]
+        prefix = "strings." + loc.value
+        a[prefix + ".cards"] = asarray([position[i] for i in table],
+                                       dtype=int32)
+        (a[prefix + ".offsets"], a[prefix + ".keys"],
+         a[prefix + ".values"]) = \
+            _csr([[(int(k), text.ref(v)) for k, v in strings.items()]
+                  for strings in table.values()], (int32, int32))
+    for loc, index in store.search_indices.items():
+        prefix = "search." + loc.value
+        a[prefix + ".ids"] = asarray([position[i] for i in index.ids],
+                                     dtype=int32)
+        for k, v in index.to_arrays().items():
+            a[prefix + "." + k] = v
+    a["text.blob"], a["text.offsets"] = text.arrays()
+    return a
+
+
+def _rows(arrays, field, i, *columns):
+    # (mapping, str, int, str...) -> zip of the column values of card i
+    offsets = arrays[field + ".offsets"]
+    start, end = int(offsets[i]), int(offsets[i + 1])
+    return zip(*[arrays[field + "." + c][start:end].tolist()
+                 for c in columns])
+
+
+def record_at(arrays, i):
+    # (mapping, int) -> CardRecord
+    '''
+    Builds the CardRecord of card i of arrays
+    '''
+    record = CardRecord(text_at(arrays, int(arrays["ids"][i])))
+    record.tags = TagRow.freeze({
+        GameTag(k): None if null else v
+        for k, v, null in _rows(arrays, "tags", i, "keys", "values", "null")})
+    record.referenced_tags = TagRow.freeze({
+        GameTag(k): None if null else v
+        for k, v, null in _rows(arrays, "referenced_tags", i,
+                                "keys", "values", "null")})
+    record.mechanics = [GameTag(m) for (m,) in
+                        _rows(arrays, "mechanics", i, "values")]
+    record.play_requirements = {
+        Requirement(k): v for k, v in _rows(arrays, "play_requirements", i,
+                                            "keys", "values")}
+    record.entourage_cards = [text_at(arrays, e) for (e,) in
+                              _rows(arrays, "entourage_cards", i, "values")]
+    record.power_history_info = dict(_rows(arrays, "power_history_info", i,
+                                           "keys", "values"))
+    record.power_definition = text_at(arrays,
+                                      int(arrays["power_definition"][i]))
+    record.master_power = text_at(arrays, int(arrays["master_power"][i]))
+    record.mechanics_mask = int(arrays["mechanics_mask"][i])
+    record.requirements_mask = int(arrays["requirements_mask"][i])
+    return record
+
+
+def strings_at(arrays, locale, j):
+    # (mapping, Locale, int) -> {GameTag: str}
+    '''
+    Builds the String tags of the j-th card of the locale
+    '''
+    return {GameTag(k): text_at(arrays, v) for k, v in
+            _rows(arrays, "strings." + locale.value, j, "keys", "values")}
+
+
+def from_arrays(arrays):
+    # {str: array} -> CardStore
+    '''
+    Builds a CardStore from the output of to_arrays
+    '''
+    store = CardStore()
+    records = [record_at(arrays, i) for i in range(len(arrays["ids"]))]
+    for value in arrays["locales"].tolist():
+        loc = Locale(value)
+        cards = arrays["strings." + value + ".cards"].tolist()
+        store.add_cards(loc, ((records[i].id, records[i],
+                               strings_at(arrays, loc, j))
+                              for j, i in enumerate(cards)))
+    store.search_indices = search_indices_at(
+        arrays, lambda cards: [records[i].id for i in cards.tolist()])
+    return store
+
+
+def search_indices_at(arrays, ids):
+    # ({str: array}, (array(int32)) -> sequence(str)) -> {Locale: SearchIndex}
+    '''
+    Returns the search indices stored in arrays, reading the postings in
+    place. ids maps the card indices of an index to its card ids
+    '''
+    indices = {}
+    for value in arrays["locales"].tolist():
+        prefix = "search." + value + "."
+        if prefix + "ids" not in arrays:
+            continue
+        indices[Locale(value)] = SearchIndex.from_arrays(
+            Locale(value), ids(arrays[prefix + "ids"]),
+            {k: arrays[prefix + k]
+             for k in ("tokens", "offsets", "cards", "weights")})
+    return indices
+
+
+def save(store, path, compressed=True):
+    # (CardStore, Path, bool) -> void
+    '''
+    Writes the arrays of store to the .npz file path
+    '''
+    (savez_compressed if compressed else savez)(path, **to_arrays(store))
+
+
+def load(path):
+    # Path -> CardStore
+    '''
+    Reads a CardStore written by save, with its search indices. The
+    members of a .npz archive cannot be memory mapped;
+    hearthcards.shared.publish(store, path=...) writes a file that
+    attach(path=...) maps instead
+    '''
+    with np_load(path) as arrays:
+        return from_arrays({k: arrays[k] for k in arrays.files})
+
+
+class _ArrayMap(Mapping):
+    '''
+    Read only mapping over the CSR row i of field. The row is decoded on
+    first access by decode(arrays, field, i) into a dict keyed by int, so
+    later lookups are plain dict lookups. Keys are iterated as key_type
+    '''
+    __slots__ = ('_arrays', '_field', '_i', '_key_type', '_decode', '_dict')
+
+    def __init__(self, arrays, field, i, key_type, decode):
+        self._arrays = arrays
+        self._field = field
+        self._i = i
+        self._key_type = key_type
+        self._decode = decode
+        self._dict = None
+
+    def _items(self):
+        # () -> dict(int, value)
+        if self._dict is None:
+            self._dict = self._decode(self._arrays, self._field, self._i)
+        return self._dict
+
+    def __getitem__(self, key):
+        return self._items()[key]
+
+    def __contains__(self, key):
+        return key in self._items()
+
+    def get(self, key, default=None):
+        return self._items().get(key, default)
+
+    def __iter__(self):
+        return (self._key_type(k) for k in self._items())
+
+    def __len__(self):
+        return len(self._items())
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+def _nullable_values(arrays, field, i):
+    return {k: None if null else v for k, v, null in
+            _rows(arrays, field, i, "keys", "values", "null")}
+
+
+def _int_values(arrays, field, i):
+    return dict(_rows(arrays, field, i, "keys", "values"))
+
+
+def _text_values(arrays, field, i):
+    return {k: text_at(arrays, v) for k, v in
+            _rows(arrays, field, i, "keys", "values")}
+
+
+class _TextList(Sequence):
+    '''
+    Sequence of the text table strings at refs, decoded on access
+    '''
+    def __init__(self, arrays, refs):
+        self._arrays = arrays
+        self._refs = refs
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [text_at(self._arrays, r) for r in self._refs[i].tolist()]
+        return text_at(self._arrays, int(self._refs[i]))
+
+    def __len__(self):
+        return len(self._refs)
+
+
+class ArrayRecord(object):
+    '''
+    CardRecord interface reading card i from arrays instead of holding its
+    own copy of the data. The tag and play requirement maps are decoded on
+    first access and kept for the life of the record
+    '''
+    __slots__ = ('_arrays', '_i', '_tags', '_referenced_tags',
+                 '_play_requirements')
+
+    def __init__(self, arrays, i):
+        self._arrays = arrays
+        self._i = i
+        self._tags = None
+        self._referenced_tags = None
+        self._play_requirements = None
+
+    @property
+    def id(self):
+        return text_at(self._arrays, int(self._arrays["ids"][self._i]))
+
+    @property
+    def tags(self):
+        if self._tags is None:
+            self._tags = _ArrayMap(self._arrays, "tags", self._i, GameTag,
+                                   _nullable_values)
+        return self._tags
+
+    @property
+    def referenced_tags(self):
+        if self._referenced_tags is None:
+            self._referenced_tags = _ArrayMap(
+                self._arrays, "referenced_tags", self._i, GameTag,
+                _nullable_values)
+        return self._referenced_tags
+
+    @property
+    def play_requirements(self):
+        if self._play_requirements is None:
+            self._play_requirements = _ArrayMap(
+                self._arrays, "play_requirements", self._i, Requirement,
+                _int_values)
+        return self._play_requirements
+
+    @property
+    def entourage_cards(self):
+        return [text_at(self._arrays, e) for (e,) in
+                _rows(self._arrays, "entourage_cards", self._i, "values")]
+
+    @property
+    def power_history_info(self):
+        return dict(_rows(self._arrays, "power_history_info", self._i,
+                          "keys", "values"))
+
+    @property
+    def mechanics(self):
+        return [GameTag(m) for (m,) in
+                _rows(self._arrays, "mechanics", self._i, "values")]
+
+    @property
+    def power_definition(self):
+        return text_at(self._arrays,
+                       int(self._arrays["power_definition"][self._i]))
+
+    @property
+    def master_power(self):
+        return text_at(self._arrays,
+                       int(self._arrays["master_power"][self._i]))
+
+    @property
+    def mechanics_mask(self):
+        return int(self._arrays["mechanics_mask"][self._i])
+
+    @property
+    def requirements_mask(self):
+        return int(self._arrays["requirements_mask"][self._i])
+
+
+class _ArrayRecords(Mapping):
+    '''
+    card id -> ArrayRecord mapping, looking ids up by binary search over
+    "ids.sorted"
+    '''
+    def __init__(self, arrays):
+        self._arrays = arrays
+
+    def index(self, card_id):
+        # str -> int or None
+        ids = self._arrays["ids.sorted"]
+        key = card_id.encode('utf-8')
+        j = int(searchsorted(ids, key))
+        if j < len(ids) and ids[j] == key:
+            return int(self._arrays["ids.order"][j])
+        return None
+
+    def __getitem__(self, card_id):
+        i = self.index(card_id)
+        if i is None:
+            raise KeyError(card_id)
+        return ArrayRecord(self._arrays, i)
+
+    def __contains__(self, card_id):
+        return self.index(card_id) is not None
+
+    def __iter__(self):
+        arrays = self._arrays
+        return (text_at(arrays, i) for i in arrays["ids"].tolist())
+
+    def __len__(self):
+        return len(self._arrays["ids"])
+
+
+class _ArrayStrings(Mapping):
+    '''
+    card id -> String tags mapping of one locale
+    '''
+    def __init__(self, arrays, records, locale):
+        self._arrays = arrays
+        self._records = records
+        self._field = "strings." + locale.value
+        self._cards = arrays[self._field + ".cards"]
+        # _rows[i]: row of card i in the locale, -1 if the locale lacks it
+        self._rows = full(len(arrays["ids"]), -1, dtype=int64)
+        self._rows[self._cards] = arange(len(self._cards))
+
+    def _strings(self, j):
+        return _ArrayMap(self._arrays, self._field, j, GameTag, _text_values)
+
+    def __getitem__(self, card_id):
+        i = self._records.index(card_id)
+        if i is None or self._rows[i] < 0:
+            raise KeyError(card_id)
+        return self._strings(int(self._rows[i]))
+
+    def __iter__(self):
+        arrays = self._arrays
+        return (text_at(arrays, int(arrays["ids"][i]))
+                for i in self._cards.tolist())
+
+    def __len__(self):
+        return len(self._cards)
+
+    def items(self):
+        arrays = self._arrays
+        return [(text_at(arrays, int(arrays["ids"][i])), self._strings(j))
+                for j, i in enumerate(self._cards.tolist())]
+
+
+class ArrayCardStore(CardStore):
+    '''
+    CardStore reading the arrays of to_arrays in place, e.g. arrays mapped
+    from shared memory. No CardRecord or String tag dict is built: the
+    CardDef views it hands out decode their fields from the arrays on
+    access, so the per process cost is the views actually requested.
+    get builds a new view per call until cards, find or as_dict have
+    indexed the locale
+    '''
+    def __init__(self, arrays):
+        super().__init__()
+        self.arrays = arrays
+        self.records = _ArrayRecords(arrays)
+        self.strings = {Locale(v): _ArrayStrings(arrays, self.records,
+                                                 Locale(v))
+                        for v in arrays["locales"].tolist()}
+        self.search_indices = search_indices_at(
+            arrays, lambda cards: _TextList(arrays, arrays["ids"][cards]))
+
+    def get(self, card_id, locale=Locale.US):
+        # (str, Locale) -> CardDef or None
+        if locale in self._views:
+            return self._views[locale].get(card_id, None)
+        table = self.strings[locale]
+        i = self.records.index(card_id)
+        if i is None or table._rows[i] < 0:
+            return None
+        return CardDef.view(ArrayRecord(self.arrays, i),
+                            table._strings(int(table._rows[i])), self, locale)
+
+    def tag_values(self, tag, default=0):
+        # (GameTag, int) -> array(int64)
+        '''
+        Returns the value of tag for every card, by card index, with default
+        where the card lacks the tag or its value is None. Reads the tag
+        arrays directly, no view or record is built
+        '''
+        arrays = self.arrays
+        counts = diff(arrays["tags.offsets"])
+        cards = repeat(arange(len(counts)), counts)
+        hit = (arrays["tags.keys"] == int(tag)) & ~arrays["tags.null"]
+        values = full(len(counts), default, dtype=int64)
+        values[cards[hit]] = arrays["tags.values"][hit]
+        return values
+
+    def cards_where(self, locale, mask):
+        # (Locale, array(bool)) -> list(CardDef)
+        '''
+        Returns CardDef views of the cards of the locale whose card index is
+        set in mask, in the order of cards(locale). Only the selected cards
+        get a view
+        '''
+        table = self.strings[locale]
+        cards = table._cards
+        return [CardDef.view(ArrayRecord(self.arrays, int(cards[j])),
+                             table._strings(j), self, locale)
+                for j in nonzero(mask[cards])[0].tolist()]
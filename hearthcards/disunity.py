@@ -4,6 +4,7 @@ import zipfile
 import subprocess
 import tempfile
 from pkg_resources import resource_filename
+from . import timing
 
 
 def disunity(commands, filename):
@@ -12,11 +13,13 @@ def disunity(commands, filename):
     """
     with tempfile.TemporaryDirectory() as tmp_dir:
         disunity_jar_loc = os.path.join(tmp_dir, "disunity.jar")
-        _unzip_disunity(tmp_dir)
+        with timing.phase("disunity.unzip"):
+            _unzip_disunity(tmp_dir)
         if not os.path.exists(disunity_jar_loc):
             raise IOError("cannot find disunity jar @ " + disunity_jar_loc)
         args = ["java", "-jar", disunity_jar_loc, commands, filename]
-        subprocess.call(args)
+        with timing.phase("disunity.java"):
+            subprocess.call(args)
 
 
 def extract(filename):
@@ -0,0 +1,180 @@
+import json
+from numpy import (add, asarray, bincount, full, int64, isin, ones, sqrt,
+                   unique, zeros)
+from scipy.stats import norm
+from . import arena
+from .tags import Hero, Rarity
+
+
+'''
+estimate module for fitting the arena draft probabilities REGULAR_TURN_P,
+SPECIAL_TURN_P and HERO_CARD_P from logged arena offers
+'''
+
+
+class DraftEstimator(object):
+    '''
+    DraftEstimator accumulates the sufficient statistics of the arena draft
+    model from chunks of logged offers (hero, pick number, three card ids)
+    in constant memory:
+    - the number of regular and special turns of each rarity
+    - per rarity, the number of cards drawn while the hero's class pool of
+    that rarity still had cards (class trials) and how many of those were
+    class cards (class hits)
+    Offers with unknown cards, mixed rarities, cards of another class or a
+    pick number outside 1 to 30 are counted as rejected. Estimators fed by different processes can be
+    combined with merge, or sent between processes with to_dict/from_dict
+    '''
+    def __init__(self, card_pool=None):
+        # list(CardDef) defaults to arena.draftable_cards()
+        if card_pool is None:
+            card_pool = arena.draftable_cards()
+        cards = list(card_pool)
+        self._index = {c.id: i for i, c in enumerate(cards)}
+        self._rarity = asarray([arena.RARITY_COLUMN.get(c.rarity, -1)
+                                for c in cards], dtype=int64)
+        self._hero = asarray([c.hero or 0 for c in cards], dtype=int64)
+        # _class_size[hero, rarity]: number of class cards of the rarity
+        self._class_size = zeros((max(Hero) + 1, len(arena.TABLE_RARITIES)),
+                                 dtype=int64)
+        is_class = (self._hero > 0) & (self._rarity >= 0)
+        add.at(self._class_size,
+               (self._hero[is_class], self._rarity[is_class]), 1)
+        self.turns = zeros((2, len(arena.TABLE_RARITIES)), dtype=int64)
+        self.class_hits = zeros(len(arena.TABLE_RARITIES), dtype=int64)
+        self.class_trials = zeros(len(arena.TABLE_RARITIES), dtype=int64)
+        self.rejected = 0
+
+    def update(self, heroes, picks, card_ids):
+        # (array(Hero, N), array(int, N), array(str, (N, 3))) -> void
+        '''
+        Accumulates a chunk of N logged offers
+        '''
+        heroes = asarray(heroes, dtype=int64)
+        picks = asarray(picks, dtype=int64)
+        card_ids = asarray(card_ids)
+        if len(heroes) == 0:
+            return
+        ids, inverse = unique(card_ids, return_inverse=True)
+        known = asarray([self._index.get(i, -1) for i in ids], dtype=int64)
+        cards = known[inverse].reshape(card_ids.shape)
+        rarity = self._rarity[cards]
+        card_hero = self._hero[cards]
+        is_class = card_hero == heroes[:, None]
+        hero_known = (heroes > 0) & (heroes < len(self._class_size))
+        valid = ((cards >= 0).all(axis=1) & (rarity >= 0).all(axis=1) &
+                 (rarity == rarity[:, :1]).all(axis=1) &
+                 (is_class | (card_hero == 0)).all(axis=1) & hero_known &
+                 (picks >= 1) & (picks <= 30))
+        self.rejected += int(len(valid) - valid.sum())
+        rarity = rarity[valid, 0]
+        is_class = is_class[valid]
+        special = isin(picks[valid], arena.SPECIAL_PICKS).astype(int64)
+        add.at(self.turns, (special, rarity), 1)
+        # a card is a class trial if the class pool still had cards left
+        class_size = self._class_size[heroes[valid], rarity]
+        drawn = zeros(len(rarity), dtype=int64)
+        n = len(arena.TABLE_RARITIES)
+        for j in range(is_class.shape[1]):
+            trial = class_size - drawn > 0
+            self.class_trials += bincount(rarity[trial], minlength=n)
+            self.class_hits += bincount(rarity[trial & is_class[:, j]],
+                                        minlength=n)
+            drawn += is_class[:, j]
+
+    def merge(self, other):
+        # DraftEstimator -> DraftEstimator
+        '''
+        Adds the statistics accumulated by other to this estimator
+        '''
+        self.turns += other.turns
+        self.class_hits += other.class_hits
+        self.class_trials += other.class_trials
+        self.rejected += other.rejected
+        return self
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def to_dict(self):
+        # (void) -> dict
+        '''
+        Returns the accumulated statistics as a JSON serializable dict
+        '''
+        return {"turns": self.turns.tolist(),
+                "class_hits": self.class_hits.tolist(),
+                "class_trials": self.class_trials.tolist(),
+                "rejected": self.rejected}
+
+    @classmethod
+    def from_dict(cls, d, card_pool=None):
+        # (dict, list(CardDef)) -> DraftEstimator
+        estimator = cls(card_pool)
+        estimator.turns[:] = d["turns"]
+        estimator.class_hits[:] = d["class_hits"]
+        estimator.class_trials[:] = d["class_trials"]
+        estimator.rejected = d["rejected"]
+        return estimator
+
+    def dumps(self):
+        return json.dumps(self.to_dict())
+
+    def regular_turn_p(self, confidence=0.95):
+        # float -> {Rarity: (float, float, float)}
+        '''
+        Estimate of REGULAR_TURN_P as a dict of Rarity to
+        (estimate, lower bound, upper bound) of the confidence interval
+        '''
+        return _proportions(self.turns[0], self.turns[0].sum(), confidence)
+
+    def special_turn_p(self, confidence=0.95):
+        # float -> {Rarity: (float, float, float)}
+        '''
+        Estimate of SPECIAL_TURN_P, see regular_turn_p
+        '''
+        p = _proportions(self.turns[1], self.turns[1].sum(), confidence)
+        del p[Rarity.COMMON]
+        return p
+
+    def hero_card_p(self, confidence=0.95):
+        # float -> {Rarity: (float, float, float)}
+        '''
+        Estimate of HERO_CARD_P, see regular_turn_p
+        '''
+        return _proportions(self.class_hits, self.class_trials, confidence)
+
+
+def estimate(chunks, card_pool=None):
+    # (iterable(tuple(heroes, picks, card_ids)), list(CardDef))
+    # -> DraftEstimator
+    '''
+    Returns a DraftEstimator fed with every chunk of logged offers
+    '''
+    estimator = DraftEstimator(card_pool)
+    for heroes, picks, card_ids in chunks:
+        estimator.update(heroes, picks, card_ids)
+    return estimator
+
+
+def _proportions(successes, trials, confidence):
+    # (array(int), array(int) or int, float) -> {Rarity: tuple(float, 3)}
+    '''
+    Wilson score intervals of successes / trials for each TABLE_RARITIES
+    column. Columns without trials are (nan, 0.0, 1.0)
+    '''
+    successes = asarray(successes, dtype=float)
+    trials = asarray(trials, dtype=float) * ones(len(successes))
+    z = norm.ppf(0.5 + confidence / 2.0)
+    with_trials = trials > 0
+    n = trials[with_trials]
+    p = full(len(successes), float('nan'))
+    lo = zeros(len(successes))
+    hi = ones(len(successes))
+    p[with_trials] = successes[with_trials] / n
+    q = p[with_trials]
+    center = (q + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * sqrt(q * (1 - q) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    lo[with_trials] = center - half
+    hi[with_trials] = center + half
+    return {r: (float(p[i]), float(lo[i]), float(hi[i]))
+            for i, r in enumerate(arena.TABLE_RARITIES)}
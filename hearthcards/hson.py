@@ -3,7 +3,18 @@
 import argparse
 import json
 import os
-from hearthcards import card_db, UNITY3D_CARDXML
+from hearthcards import card_store, columnar, timing, UNITY3D_CARDXML
+from hearthcards.search import search_indices
+
+
+def write_json(f, data):
+    f.write(json.dumps(data, sort_keys=True, indent=4, ensure_ascii=False))
+
+
+def write_ndjson(f, data):
+    for card in data:
+        f.write(json.dumps(card, sort_keys=True, ensure_ascii=False))
+        f.write("\n")
 
 
 def main():
@@ -28,19 +39,59 @@ def main():
                         required=False,
                         help="""Output directory. By default, outputs data into
                         current/working/directory/hson-output/""")
+    parser.add_argument('-s', '--search-index', default=False,
+                        required=False, action='store_true',
+                        help="""Also output a prebuilt full text search index
+                        per locale. columnar: stored in cards.npz and loaded
+                        with the store. json, ndjson: one
+                        <locale>.index.json per locale, loadable with
+                        hearthcards.search.SearchIndex.load""")
+    parser.add_argument('-f', '--format', default="json", required=False,
+                        choices=("json", "ndjson", "columnar"),
+                        help="""Output format. json: one indented list of cards
+                        per locale. ndjson: one card per line per locale, for
+                        streaming. columnar: a single cards.npz of numpy arrays
+                        holding every locale, loadable with
+                        hearthcards.columnar.load; --raw does not apply.
+                        Default: json""")
+    parser.add_argument('-p', '--profile', default=False, required=False,
+                        action='store_true',
+                        help="""Print a breakdown of where the time went to
+                        stderr""")
     args = parser.parse_args()
+    if args.profile:
+        report = timing.enable()
     if not os.path.exists(args.output_dir):
         os.makedirs(args.output_dir)
     machine_repr = lambda card, lang: card.repr(lang)
     human_repr = lambda card, lang: card.human_repr(lang)
     repr = machine_repr if args.raw else human_repr
-    card_defs = card_db(args.cardxml)
-    for (lang, cards) in card_defs.items():
-        data = [repr(card, lang) for card in cards]
-        filename = os.path.join(args.output_dir, "{0}.json".format(lang.value))
-        with open(filename, 'w+', encoding='utf-8') as f:
-            f.write(json.dumps(data, sort_keys=True,
-                               indent=4, ensure_ascii=False))
+    write = write_ndjson if args.format == "ndjson" else write_json
+    with timing.phase("hson.card_db"):
+        store = card_store(args.cardxml)
+        card_defs = store.as_dict()
+    if args.search_index:
+        with timing.phase("hson.search_index"):
+            store.search_indices = search_indices(card_defs)
+    if args.format == "columnar":
+        with timing.phase("hson.write.columnar"):
+            columnar.save(store, os.path.join(args.output_dir, "cards.npz"))
+    else:
+        for (lang, cards) in card_defs.items():
+            with timing.phase("hson.write." + lang.value):
+                filename = os.path.join(args.output_dir, "{0}.{1}".format(
+                    lang.value, args.format))
+                with open(filename, 'w+', encoding='utf-8') as f:
+                    write(f, [repr(card, lang) for card in cards])
+    if args.search_index and args.format != "columnar":
+        with timing.phase("hson.write.search_index"):
+            for (lang, index) in store.search_indices.items():
+                filename = os.path.join(args.output_dir,
+                                        "{0}.index.json".format(lang.value))
+                with open(filename, 'w+', encoding='utf-8') as f:
+                    index.dump(f)
+    if args.profile:
+        timing.print_report(report)
 
 if __name__ == "__main__":
     main()
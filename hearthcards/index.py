@@ -0,0 +1,95 @@
+from numpy import array, flatnonzero, ones, int64, uint32
+from .tags import MechanicBits, requirement_bit
+
+
+'''
+index module for answering mechanic, requirement, class and type queries
+over a pool of cards with bitwise operations instead of per-card scans
+'''
+
+
+class MechanicsIndex(object):
+    '''
+    MechanicsIndex encodes a list of CardDef objects as parallel numpy arrays:
+    - mechanics: the CardRecord.mechanics_mask of each card
+    - requirements: the CardRecord.requirements_mask of each card
+    - heroes: the Hero value of each card, 0 for neutral cards
+    - types: the CardType value of each card, 0 if missing
+    and keeps an inverted index from each mechanic to the sorted array of
+    indices of the cards having it. Indices refer to positions in cards
+    '''
+    def __init__(self, cards):
+        self.cards = list(cards)
+        self.mechanics = array([c.record.mechanics_mask for c in self.cards],
+                               dtype=uint32)
+        self.requirements = array(
+            [c.record.requirements_mask for c in self.cards], dtype=int64)
+        self.heroes = array([c.hero or 0 for c in self.cards], dtype=int64)
+        self.types = array([c.type or 0 for c in self.cards], dtype=int64)
+        self.postings = {m: flatnonzero(self.mechanics & bit)
+                         for (m, bit) in MechanicBits.items()}
+
+    def with_mechanic(self, mechanic):
+        # GameTag -> array(int)
+        '''
+        Returns the indices of the cards having the mechanic
+        '''
+        return self.postings[mechanic]
+
+    def mask(self, any_of=(), all_of=(), none_of=(), requirements=(),
+             heroes=None, types=None):
+        # (...) -> array(bool)
+        '''
+        Returns a boolean array selecting the cards that
+        - have at least one of the any_of mechanics (if any are given)
+        - have every one of the all_of mechanics
+        - have none of the none_of mechanics
+        - have every one of the play requirements
+        - belong to one of heroes, where None selects neutral cards
+        - are one of the CardTypes in types
+        '''
+        selected = ones(len(self.cards), dtype=bool)
+        if any_of:
+            selected &= (self.mechanics & _mechanics_mask(any_of)) != 0
+        if all_of:
+            m = _mechanics_mask(all_of)
+            selected &= (self.mechanics & m) == m
+        if none_of:
+            selected &= (self.mechanics & _mechanics_mask(none_of)) == 0
+        if requirements:
+            m = 0
+            for req in requirements:
+                m |= requirement_bit(req)
+            selected &= (self.requirements & m) == m
+        if heroes is not None:
+            hs = array([h or 0 for h in heroes], dtype=int64)
+            selected &= (self.heroes[:, None] == hs).any(axis=1)
+        if types is not None:
+            ts = array([int(t) for t in types], dtype=int64)
+            selected &= (self.types[:, None] == ts).any(axis=1)
+        return selected
+
+    def indices(self, **query):
+        # (...) -> array(int)
+        '''
+        Returns the indices of the cards selected by mask(**query)
+        '''
+        return flatnonzero(self.mask(**query))
+
+    def select(self, **query):
+        # (...) -> list(CardDef)
+        '''
+        Returns the CardDef objects selected by mask(**query)
+        '''
+        return [self.cards[i] for i in self.indices(**query)]
+
+    def __len__(self):
+        return len(self.cards)
+
+
+def _mechanics_mask(mechanics):
+    # iterable(GameTag) -> int
+    m = 0
+    for mechanic in mechanics:
+        m |= MechanicBits[mechanic]
+    return m
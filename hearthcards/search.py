@@ -0,0 +1,298 @@
+import json
+import re
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from numpy import (array, asarray, bytes_, cumsum, int32, int64, searchsorted,
+                   zeros)
+from .locale import Locale
+from .tags import GameTag
+
+
+'''
+search module for full text card search over names, card text and flavor
+text with prefix and fuzzy (single edit) matching
+'''
+
+# locales tokenized into character unigrams and bigrams rather than words
+CJK_LOCALES = {Locale.CN, Locale.TW, Locale.KR}
+
+# shorter tokens are not expanded by fuzzy search: every 1 or 2 character
+# token is one edit away from most others
+FUZZY_MIN_LENGTH = 3
+
+# searchable String tags and the weight of a match in each
+FIELD_WEIGHTS = {GameTag.CARDNAME: 4,
+                 GameTag.CARDTEXT_INHAND: 2,
+                 GameTag.FLAVORTEXT: 1}
+
+# markup and placeholders found in card text, e.g. <b>Battlecry:</b> Deal $3
+_MARKUP = re.compile(r'<[^>]*>|[$#@]')
+_WORD = re.compile(r'\w+')
+# hangul jamo, kana, bopomofo, CJK ideographs and hangul syllables
+_CJK = re.compile('[\u1100-\u11ff\u3040-\u30ff\u3100-\u312f\u3400-\u4dbf'
+                  '\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+
+
+def tokenize(text, locale):
+    # (str, Locale) -> list(str)
+    '''
+    Splits text into case folded search tokens. Words are tokens in every
+    locale; runs of CJK characters are split into character unigrams and
+    bigrams for the CJK_LOCALES, since zhCN, zhTW and koKR card text does
+    not reliably separate words with spaces
+    '''
+    if not text:
+        return []
+    text = _MARKUP.sub(' ', text).casefold()
+    if locale not in CJK_LOCALES:
+        return _WORD.findall(text)
+    tokens = []
+    for word in _WORD.findall(text):
+        runs = _CJK.findall(word)
+        if not runs:
+            tokens.append(word)
+            continue
+        tokens.extend(w for w in _CJK.split(word) if w)
+        for run in runs:
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class SearchIndex(object):
+    '''
+    Inverted index from search token to the cards of a single locale
+    containing it. Lookups are hash lookups for exact tokens and a binary
+    search over the sorted vocabulary for prefixes. Fuzzy lookups use a
+    lazily built single deletion neighborhood of the vocabulary.
+    The index can be stored as arrays, see to_arrays and from_arrays
+    '''
+    def __init__(self, locale, ids, postings, vocab=None):
+        # (Locale, list(str), {str: {int: int}}, list(str)) -> SearchIndex
+        self.locale = locale
+        self.ids = ids
+        self.postings = postings
+        self.vocab = sorted(postings) if vocab is None else vocab
+        self._deletes = None
+
+    @classmethod
+    def from_cards(cls, cards, locale):
+        # (list(CardDef), Locale) -> SearchIndex
+        '''
+        Builds the index of the FIELD_WEIGHTS String tags of cards
+        '''
+        ids = []
+        postings = {}
+        for i, card in enumerate(cards):
+            ids.append(card.id)
+            for tag, weight in FIELD_WEIGHTS.items():
+                for token in set(tokenize(card.get_tag(tag), locale)):
+                    hits = postings.setdefault(token, {})
+                    hits[i] = hits.get(i, 0) + weight
+        return cls(locale, ids, postings)
+
+    def search(self, query, limit=None, prefix=True, fuzzy=False):
+        # (str, int, bool, bool) -> list(str)
+        '''
+        Returns the ids of the cards matching every token of query, best
+        matches first. With prefix=True the last query token also matches
+        any token it is a prefix of, for autocompletion. With fuzzy=True
+        tokens also match tokens one edit (insertion, deletion, substitution
+        or transposition) away, except tokens shorter than FUZZY_MIN_LENGTH
+        and CJK n-grams, see similar
+        '''
+        tokens = tokenize(query, self.locale)
+        if not tokens:
+            return []
+        scores = None
+        for n, token in enumerate(tokens):
+            terms = {token}
+            if prefix and n == len(tokens) - 1:
+                terms.update(self.complete(token))
+            if fuzzy:
+                terms.update(self.similar(token))
+            hits = {}
+            for term in terms:
+                for i, weight in self.postings.get(term, {}).items():
+                    if weight > hits.get(i, 0):
+                        hits[i] = weight
+            if scores is None:
+                scores = hits
+            else:
+                scores = {i: s + hits[i] for i, s in scores.items()
+                          if i in hits}
+            if not scores:
+                return []
+        ranked = sorted(scores, key=lambda i: (-scores[i], self.ids[i]))
+        return [self.ids[i] for i in ranked[:limit]]
+
+    def complete(self, prefix):
+        # str -> list(str)
+        '''
+        Returns the vocabulary tokens starting with prefix
+        '''
+        start = bisect_left(self.vocab, prefix)
+        end = start
+        while end < len(self.vocab) and self.vocab[end].startswith(prefix):
+            end += 1
+        return self.vocab[start:end]
+
+    def similar(self, token):
+        # str -> list(str)
+        '''
+        Returns the vocabulary tokens within one edit of token. Tokens
+        shorter than FUZZY_MIN_LENGTH and CJK n-grams, which are one or two
+        characters, have no similar tokens
+        '''
+        if not _fuzzy(token):
+            return []
+        if self._deletes is None:
+            self._deletes = {}
+            for term in filter(_fuzzy, self.vocab):
+                for d in _deletes(term):
+                    self._deletes.setdefault(d, set()).add(term)
+        candidates = set()
+        for d in _deletes(token):
+            candidates |= self._deletes.get(d, set())
+        return [c for c in candidates if _within_one_edit(token, c)]
+
+    def to_arrays(self):
+        # (void) -> {str: array}
+        '''
+        Returns the postings as arrays: "tokens", the utf-8 vocabulary in
+        sorted order, and CSR style "offsets" with len(tokens) + 1 entries
+        into the card numbers "cards" and their "weights"
+        '''
+        rows = [self.postings[t] for t in self.vocab]
+        offsets = zeros(len(rows) + 1, dtype=int64)
+        offsets[1:] = cumsum([len(r) for r in rows])
+        return {"tokens": array([t.encode('utf-8') for t in self.vocab],
+                                dtype=bytes_),
+                "offsets": offsets,
+                "cards": asarray([i for r in rows for i in r], dtype=int32),
+                "weights": asarray([w for r in rows for w in r.values()],
+                                   dtype=int32)}
+
+    @classmethod
+    def from_arrays(cls, locale, ids, arrays):
+        # (Locale, list(str), {str: array}) -> SearchIndex
+        '''
+        Returns the index over the output of to_arrays, reading the arrays
+        in place: postings are decoded per token on lookup
+        '''
+        return cls(locale, ids, _ArrayPostings(arrays),
+                   _ArrayVocab(arrays["tokens"]))
+
+    def to_dict(self):
+        # (void) -> dict
+        return {"locale": self.locale.value,
+                "ids": self.ids,
+                "postings": {t: [[i, w] for i, w in hits.items()]
+                             for t, hits in self.postings.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        # dict -> SearchIndex
+        return cls(Locale(d["locale"]), d["ids"],
+                   {t: {i: w for i, w in hits}
+                    for t, hits in d["postings"].items()})
+
+    def dump(self, fp):
+        json.dump(self.to_dict(), fp, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, fp):
+        return cls.from_dict(json.load(fp))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def search_indices(card_defs):
+    # {Locale: list(CardDef)} -> {Locale: SearchIndex}
+    '''
+    Builds a SearchIndex per locale from the output of carddef.card_db
+    '''
+    return {locale: SearchIndex.from_cards(cards, locale)
+            for locale, cards in card_defs.items()}
+
+
+class _ArrayVocab(Sequence):
+    '''
+    Sorted vocabulary over the utf-8 "tokens" array of to_arrays
+    '''
+    def __init__(self, tokens):
+        self._tokens = tokens
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [t.decode('utf-8') for t in self._tokens[i].tolist()]
+        return self._tokens[i].decode('utf-8')
+
+    def __len__(self):
+        return len(self._tokens)
+
+
+class _ArrayPostings(Mapping):
+    '''
+    token -> {card number: weight} mapping over the arrays of to_arrays,
+    looking tokens up by binary search. UTF-8 preserves the code point
+    order, so the arrays are in the order of the vocabulary
+    '''
+    def __init__(self, arrays):
+        self._tokens = arrays["tokens"]
+        self._offsets = arrays["offsets"]
+        self._cards = arrays["cards"]
+        self._weights = arrays["weights"]
+
+    def get(self, token, default=None):
+        key = token.encode('utf-8')
+        j = int(searchsorted(self._tokens, key))
+        if j == len(self._tokens) or self._tokens[j] != key:
+            return default
+        start, end = int(self._offsets[j]), int(self._offsets[j + 1])
+        return dict(zip(self._cards[start:end].tolist(),
+                        self._weights[start:end].tolist()))
+
+    def __getitem__(self, token):
+        hits = self.get(token)
+        if hits is None:
+            raise KeyError(token)
+        return hits
+
+    def __contains__(self, token):
+        return self.get(token) is not None
+
+    def __iter__(self):
+        return (t.decode('utf-8') for t in self._tokens.tolist())
+
+    def __len__(self):
+        return len(self._tokens)
+
+
+def _fuzzy(token):
+    # str -> bool
+    return len(token) >= FUZZY_MIN_LENGTH and not _CJK.search(token)
+
+
+def _deletes(term):
+    # str -> set(str)
+    return {term} | {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a, b):
+    # (str, str) -> bool
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        return (len(diff) == 1 or
+                (len(diff) == 2 and diff[1] == diff[0] + 1 and
+                 a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]))
+    short, long = (a, b) if len(a) < len(b) else (b, a)
+    i = 0
+    while i < len(short) and short[i] == long[i]:
+        i += 1
+    return short[i:] == long[i + 1:]
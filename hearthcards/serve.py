@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from urllib.parse import parse_qsl, urlsplit
+from . import arena, carddef, shared
+from .cache import DraftCache
+from .locale import Locale
+from .search import SearchIndex
+from .tags import CardRace, CardType, GameTag, Hero, Rarity
+
+
+'''
+serve module: a localhost JSON service answering card lookups and arena
+draft statistics from a single warm process
+
+    python -m hearthcards.serve [-p PORT] [-w WORKERS]
+
+Every operation is available as GET /<op>?param=value, as POST /<op> with a
+JSON object of params, and inside POST /batch, whose body is a JSON list of
+{"op": <op>, "params": {...}} objects answered with a list of results:
+- card: id, locale -> card
+- find: name, locale -> list of cards with the name
+- search: q, locale, limit, fuzzy -> list of cards
+- draft: hero, filter, N, stat (p, e, var, sd, pmf or at_least), k
+Cards are returned in the hson human readable representation.
+Draft filters are declarative, see Filter. The card data is loaded once by
+the service process and published with the shared module; the worker
+processes evaluating draft statistics attach to it read only
+'''
+
+DEFAULT_PORT = 8737
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Filter(object):
+    '''
+    Card predicate built from a JSON filter spec. A spec is an object whose
+    keys must all match:
+    - "all": [spec, ...], "any": [spec, ...], "not": spec
+    - "id", "name": exact id, case insensitive name
+    - "text": case insensitive substring of the card text in hand
+    - "type", "rarity", "race", "mechanic": enum names, e.g. "MINION"
+    - "hero": class name, or null for neutral cards
+    - "cost", "attack", "health", "durability": a number or
+    {"min": number, "max": number}
+    Specs are plain JSON, so draft requests hand the spec rather than the
+    Filter to the worker processes
+    '''
+    _ENUMS = {"type": CardType, "rarity": Rarity, "race": CardRace,
+              "hero": Hero}
+    _NUMBERS = ("cost", "attack", "health", "durability")
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            raise ServiceError(400, "filter must be an object")
+        self.tests = [self._compile(k, v) for k, v in sorted(spec.items())]
+
+    def _compile(self, key, value):
+        # (str, object) -> ((CardDef) -> bool)
+        try:
+            if key == "all":
+                fs = [Filter(s) for s in value]
+                return lambda c: all(f(c) for f in fs)
+            if key == "any":
+                fs = [Filter(s) for s in value]
+                return lambda c: any(f(c) for f in fs)
+            if key == "not":
+                f = Filter(value)
+                return lambda c: not f(c)
+            if key == "id":
+                return lambda c: c.id == value
+            if key == "name":
+                name = value.casefold()
+                return lambda c: (
+                    (c.get_tag(GameTag.CARDNAME) or '').casefold() == name)
+            if key == "text":
+                text = value.casefold()
+                return lambda c: text in (c.cardtext_inhand or '').casefold()
+            if key == "mechanic":
+                mechanic = GameTag[value]
+                return lambda c: c.has_mechanic(mechanic)
+            if key in self._ENUMS:
+                target = None if value is None else self._ENUMS[key][value]
+                return lambda c: getattr(c, key) == target
+            if key in self._NUMBERS:
+                if isinstance(value, dict):
+                    lo = value.get("min", float('-inf'))
+                    hi = value.get("max", float('inf'))
+                else:
+                    lo = hi = value
+                if not all(_is_number(v) for v in (lo, hi)):
+                    raise TypeError(key)
+                return lambda c: (getattr(c, key) is not None and
+                                  lo <= getattr(c, key) <= hi)
+        except (KeyError, TypeError, AttributeError):
+            raise ServiceError(400, "bad filter value for " + key)
+        raise ServiceError(400, "unknown filter key " + key)
+
+    def __call__(self, card):
+        return all(test(card) for test in self.tests)
+
+
+# per process cache of the draft statistics, see draft_stat
+_DRAFT_CACHE = DraftCache()
+
+
+def draft_stat(hero, spec, N=30, stat="e", k=None):
+    # (str, dict, int, str, int) -> float or list(float)
+    '''
+    Evaluates a draft statistic of the arena.draftable_cards pool. Runs in
+    the worker processes of the service
+    '''
+    pred = Filter(spec)
+    if stat == "pmf":
+        return _DRAFT_CACHE.pmf(Hero[hero], pred, N).tolist()
+    if stat == "p":
+        return _DRAFT_CACHE.draft_p(Hero[hero], pred, N)(k)
+    if stat == "at_least":
+        return _DRAFT_CACHE.draft_at_least(Hero[hero], pred, k, N)
+    stats = {"e": _DRAFT_CACHE.draft_e, "var": _DRAFT_CACHE.draft_var,
+             "sd": _DRAFT_CACHE.draft_sd}
+    return stats[stat](Hero[hero], pred, N)
+
+
+class Service(object):
+    '''
+    Service answers the operations of the module docstring from store,
+    which defaults to loading carddef.card_store() once. Draft statistics
+    are evaluated in executor, which defaults to running them inline
+    '''
+    def __init__(self, executor=None, store=None):
+        arena.draftable_cards(store=store)
+        self.store = arena.draftable_cards.store
+        self.executor = executor
+        self._search = dict(self.store.search_indices)
+        self.ops = {"card": self.card, "find": self.find,
+                    "search": self.search, "draft": self.draft}
+
+    async def dispatch(self, op, params):
+        # (str, dict) -> object
+        if op == "batch":
+            if not isinstance(params, list):
+                raise ServiceError(400, "batch body must be a list")
+            return await asyncio.gather(*[self._batch_item(item)
+                                          for item in params])
+        if op not in self.ops:
+            raise ServiceError(404, "unknown operation " + op)
+        if not isinstance(params, dict):
+            raise ServiceError(400, "params must be an object")
+        return await self.ops[op](**_strings_to_params(params))
+
+    async def _batch_item(self, item):
+        try:
+            return {"result": await self.dispatch(item["op"],
+                                                  item.get("params", {}))}
+        except ServiceError as e:
+            return {"error": e.message, "status": e.status}
+        except (KeyError, TypeError):
+            return {"error": "batch items need an op", "status": 400}
+        except ValueError:
+            return {"error": "bad parameters", "status": 400}
+
+    async def card(self, id, locale="enUS"):
+        card = self.store.get(id, _locale(locale))
+        if card is None:
+            raise ServiceError(404, "unknown card " + id)
+        return _card_json(card, _locale(locale))
+
+    async def find(self, name, locale="enUS"):
+        loc = _locale(locale)
+        return [_card_json(c, loc) for c in self.store.find(name, loc)]
+
+    async def search(self, q, locale="enUS", limit=10, fuzzy=False):
+        loc = _locale(locale)
+        limit = _int("limit", limit)
+        if limit < 0:
+            raise ServiceError(400, "limit must not be negative")
+        ids = self._search_index(loc).search(q, limit, fuzzy=bool(fuzzy))
+        return [_card_json(self.store.get(i, loc), loc) for i in ids]
+
+    def build_search_indices(self):
+        '''
+        Builds the search index of every locale the store did not load
+        with, so that search does not build one inside the event loop
+        '''
+        for loc in self.store.locales:
+            self._search_index(loc)
+
+    def _search_index(self, locale):
+        # Locale -> SearchIndex
+        if locale not in self._search:
+            self._search[locale] = SearchIndex.from_cards(
+                self.store.cards(locale), locale)
+        return self._search[locale]
+
+    async def draft(self, hero, filter, N=30, stat="e", k=None):
+        if hero not in Hero.__members__:
+            raise ServiceError(400, "unknown hero " + str(hero))
+        if stat not in ("p", "e", "var", "sd", "pmf", "at_least"):
+            raise ServiceError(400, "unknown stat " + str(stat))
+        if stat in ("p", "at_least") and k is None:
+            raise ServiceError(400, "stat " + stat + " needs k")
+        N = _int("N", N)
+        if not 0 <= N <= 30:
+            raise ServiceError(400, "N must be in [0, 30]")
+        Filter(filter)
+        args = (hero, filter, N, stat, None if k is None else _int("k", k))
+        if self.executor is None:
+            return draft_stat(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, draft_stat, *args)
+
+    async def handle(self, reader, writer):
+        # asyncio.start_server client callback, one HTTP/1.1 connection
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, result = await self._respond(method, target, body)
+                data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    "HTTP/1.1 {0} {1}\r\nContent-Type: application/json; "
+                    "charset=utf-8\r\nContent-Length: {2}\r\n"
+                    "Connection: {3}\r\n\r\n".format(
+                        status, _REASONS.get(status, ""), len(data),
+                        "keep-alive" if keep_alive else "close")
+                    .encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, target, body):
+        # (str, str, bytes) -> (int, object)
+        url = urlsplit(target)
+        op = url.path.strip("/")
+        try:
+            if method == "GET":
+                params = dict(parse_qsl(url.query))
+            elif method == "POST":
+                try:
+                    params = json.loads(body.decode('utf-8') or "{}")
+                except ValueError:
+                    raise ServiceError(400, "body is not valid JSON")
+            else:
+                raise ServiceError(405, "method not allowed")
+            return 200, await self.dispatch(op, params)
+        except ServiceError as e:
+            return e.status, {"error": e.message}
+        except (TypeError, ValueError):
+            return 400, {"error": "bad parameters for " + op}
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed"}
+
+
+async def _read_request(reader):
+    # StreamReader -> (str, str, dict, bytes) or None at end of stream
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    method, target, _ = line.decode('latin-1').split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = line.decode('latin-1').partition(":")
+        headers[k.strip().lower()] = v.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, target, headers, body
+
+
+def _strings_to_params(params):
+    # GET query values are strings; JSON filters arrive serialized
+    if isinstance(params.get("filter", None), str):
+        try:
+            params = dict(params, filter=json.loads(params["filter"]))
+        except ValueError:
+            raise ServiceError(400, "filter is not valid JSON")
+    if isinstance(params.get("fuzzy", None), str):
+        params = dict(params, fuzzy=params["fuzzy"] not in ("", "0", "false"))
+    return params
+
+
+def _int(name, value):
+    # (str, object) -> int
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ServiceError(400, name + " must be an integer")
+
+
+def _is_number(value):
+    # JSON numbers; bool is an int subclass but not a number here
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _locale(value):
+    # str -> Locale
+    try:
+        return Locale(value)
+    except ValueError:
+        raise ServiceError(400, "unknown locale " + str(value))
+
+
+def _card_json(card, locale):
+    # (CardDef, Locale) -> dict
+    return {k: v.name if isinstance(v, Enum) else v
+            for k, v in card.human_repr(locale).items()}
+
+
+def _check_local(host):
+    if host == "localhost":
+        return
+    try:
+        if ipaddress.ip_address(host).is_loopback:
+            return
+    except ValueError:
+        pass
+    raise ValueError("hearthcards.serve only listens on localhost, not "
+                     + host)
+
+
+def _attach_worker(name, path):
+    # ProcessPoolExecutor initializer: draft statistics use the published
+    # store instead of loading the card data again
+    arena.draftable_cards(store=shared.attach(name, path))
+
+
+def _publish(store):
+    # CardStore -> Published
+    if shared.shared_memory is not None:
+        return shared.publish(store)
+    fd, path = tempfile.mkstemp(suffix=".bin")
+    os.close(fd)
+    return shared.publish(store, path=path)
+
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, workers=None):
+    # (str, int, int) -> void
+    '''
+    Loads and publishes the card data, builds the search indices, starts
+    the worker processes and serves forever
+    '''
+    _check_local(host)
+    service = Service(store=carddef.card_store())
+    service.build_search_indices()
+    published = _publish(service.store)
+    try:
+        with ProcessPoolExecutor(
+                max_workers=workers, initializer=_attach_worker,
+                initargs=(published.name, published.path)) as executor:
+            # start the workers before accepting connections, otherwise
+            # forked workers inherit and hold open the client sockets. A
+            # worker that fails to attach breaks the pool here
+            executor.submit(int).result()
+            service.executor = executor
+            server = await asyncio.start_server(service.handle, host, port)
+            async with server:
+                await server.serve_forever()
+    finally:
+        published.close()
+        published.unlink()
+        if published.path is not None:
+            os.remove(published.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve card lookups and arena statistics on localhost")
+    parser.add_argument('--host', default="127.0.0.1",
+                        help="""Loopback address to listen on""")
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT,
+                        help="""Port to listen on. Default {0}""".format(
+                            DEFAULT_PORT))
+    parser.add_argument('-w', '--workers', type=int,
+                        default=os.cpu_count(),
+                        help="""Number of worker processes evaluating draft
+                        statistics. Default: number of CPUs""")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import json
+import mmap
+import os
+import struct
+from numpy import dtype, frombuffer
+from . import columnar, timing
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+
+'''
+shared module for loading the card database once and sharing it between
+worker processes. The parent publishes a CardStore as the flat arrays of
+the columnar module into a multiprocessing.shared_memory block, or into a
+file when a path is given or shared memory is not available:
+
+    published = shared.publish(card_store())
+    # in each worker
+    store = shared.attach(published.name)
+
+Workers map the block read only and wrap it in a columnar.ArrayCardStore,
+so they neither parse the card data nor keep a copy of it. The block
+starts with the length of a JSON header giving the dtype, shape and offset
+of every array
+'''
+
+# array data offsets are aligned to this many bytes
+ALIGNMENT = 64
+
+_LENGTH = struct.Struct("<Q")
+
+
+def _layout(arrays):
+    # {str: array} -> (bytes, list((int, array)), int)
+    '''
+    Returns the header, the offset of every array and the total size of
+    the block holding arrays
+    '''
+    # the header size depends on the offsets, which depend on the header
+    # size: reserve room for offsets up to 12 digits
+    entries = {k: [a.dtype.str, list(a.shape), 10 ** 12]
+               for k, a in arrays.items()}
+    position = len(json.dumps(entries).encode('utf-8')) + _LENGTH.size
+    placed = []
+    for k, a in sorted(arrays.items()):
+        position += -position % ALIGNMENT
+        entries[k][2] = position
+        placed.append((position, a))
+        position += a.nbytes
+    header = json.dumps(entries).encode('utf-8')
+    return _LENGTH.pack(len(header)) + header, placed, max(position, 1)
+
+
+def _read(buf):
+    # buffer -> {str: array}
+    '''
+    Returns read only numpy views of the arrays of a published block
+    '''
+    (length,) = _LENGTH.unpack_from(buf, 0)
+    entries = json.loads(bytes(buf[_LENGTH.size:_LENGTH.size + length])
+                         .decode('utf-8'))
+    arrays = {}
+    for k, (dt, shape, offset) in entries.items():
+        dt = dtype(dt)
+        count = 1
+        for n in shape:
+            count *= n
+        a = frombuffer(buf, dtype=dt, count=count, offset=offset)
+        a = a.reshape(shape)
+        a.flags.writeable = False
+        arrays[k] = a
+    return arrays
+
+
+class Published(object):
+    '''
+    Handle of the process that published a card store. name is the shared
+    memory block name, or None when the store was written to path. Call
+    close then unlink once the workers are done
+    '''
+    def __init__(self, name=None, path=None, shm=None):
+        self.name = name
+        self.path = path
+        self._shm = shm
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+
+    def unlink(self):
+        if self._shm is not None:
+            self._shm.unlink()
+
+
+def publish(store, name=None, path=None):
+    # (CardStore, str, Path) -> Published
+    '''
+    Copies store into a new shared memory block, named name or a random
+    name, or into the file path when path is given. Without shared memory
+    (python < 3.8) a path is required
+    '''
+    with timing.phase("shared.publish"):
+        header, placed, size = _layout(columnar.to_arrays(store))
+        if path is not None:
+            with open(path, 'wb') as f:
+                f.truncate(size)
+                f.write(header)
+                for offset, a in placed:
+                    f.seek(offset)
+                    f.write(a.tobytes())
+            return Published(path=path)
+        if shared_memory is None:
+            raise RuntimeError("shared memory needs python 3.8, publish to "
+                               "a path instead")
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:len(header)] = header
+        for offset, a in placed:
+            shm.buf[offset:offset + a.nbytes] = a.tobytes()
+        return Published(name=shm.name, shm=shm)
+
+
+class SharedCardStore(columnar.ArrayCardStore):
+    '''
+    ArrayCardStore over a published block, see attach. close releases the
+    mapping; it raises BufferError while cards of the store are still
+    referenced
+    '''
+    def __init__(self, buf, handle):
+        super().__init__(_read(buf))
+        self._handle = handle
+
+    def close(self):
+        self.arrays = self.records = self.strings = None
+        self._views = {}
+        self._names = {}
+        self._handle.close()
+
+
+def attach(name=None, path=None):
+    # (str, Path) -> SharedCardStore
+    '''
+    Maps the card store published under name, or to path, read only
+    '''
+    with timing.phase("shared.attach"):
+        if path is not None:
+            with open(path, 'rb') as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return SharedCardStore(buf, buf)
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # python < 3.13 registers every attached block with the resource
+            # tracker, which unlinks it when the worker exits: the publisher
+            # owns the block, so skip the registration
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+        if os.name != 'posix':
+            return SharedCardStore(shm.buf, shm)
+        # map the block again read only, so the arrays do not depend on the
+        # SharedMemory object, which refuses to be collected while they live
+        buf = mmap.mmap(shm._fd, shm.size, access=mmap.ACCESS_READ)
+        shm.close()
+        return SharedCardStore(buf, buf)
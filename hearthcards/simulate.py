@@ -0,0 +1,172 @@
+from numpy import (arange, argmax, array, asarray, clip, cumsum, full,
+                   int64, maximum, minimum, nonzero, random, searchsorted,
+                   where, zeros)
+from . import arena
+from .tags import CardType
+
+
+'''
+simulate module for running many arena drafts in lockstep under a pick
+policy and collecting the distribution of the resulting decks
+'''
+
+# mana curve buckets: cost 0, 1, ..., 6 and 7+
+CURVE_BUCKETS = 8
+
+# picks per arena draft
+PICKS = 30
+
+
+class DeckState(object):
+    '''
+    DeckState holds the decks of B drafts being simulated in lockstep:
+    - picks: (B, PICKS) pool indices of the picked cards, -1 for picks not
+    made yet
+    - curve: (B, CURVE_BUCKETS) number of picked cards per mana bucket
+    - types: (B, max(CardType) + 1) number of picked cards per CardType
+    - score: (B,) sum of the policy scores of the picked cards
+    - pick: number of picks made so far
+    '''
+    def __init__(self, B):
+        self.picks = full((B, PICKS), -1, dtype=int64)
+        self.curve = zeros((B, CURVE_BUCKETS), dtype=int64)
+        self.types = zeros((B, max(CardType) + 1), dtype=int64)
+        self.score = zeros(B)
+        self.pick = 0
+
+    def type_counts(self, card_type):
+        # CardType -> array(int, B)
+        return self.types[:, int(card_type)]
+
+
+class PickPolicy(object):
+    '''
+    PickPolicy scores offered cards with a per card score array plus a mana
+    curve adjustment: an offered card whose mana bucket holds fewer cards
+    than curve asks for gets curve_weight for each missing card. Any
+    callable taking (offers, deck, simulation) and returning a (B, 3) array
+    of scores can be used as a policy
+    '''
+    def __init__(self, scores, curve=None, curve_weight=0.0):
+        # (array(float, len(card_pool)), array(int, CURVE_BUCKETS), float)
+        self.scores = asarray(scores, dtype=float)
+        self.curve = None if curve is None else asarray(curve)
+        self.curve_weight = curve_weight
+
+    def __call__(self, offers, deck, simulation):
+        # (array(int, (B, 3)), DeckState, DraftSimulation) -> (B, 3)
+        scores = self.scores[offers]
+        if self.curve is not None and self.curve_weight:
+            bucket = simulation.bucket[offers]
+            have = deck.curve[arange(len(offers))[:, None], bucket]
+            missing = maximum(self.curve[bucket] - have, 0)
+            scores = scores + self.curve_weight * missing
+        return scores
+
+
+class DraftSimulation(object):
+    '''
+    DraftSimulation generates arena draft offers for a hero like
+    arena.draft_e assumes: each pick draws its rarity from regular_p or, on
+    the arena.SPECIAL_PICKS, special_p; each of the 3 cards is a class card
+    with probability hero_p[rarity] while the class pool of that rarity has
+    cards left, and cards are drawn without replacement within an offer.
+    run() plays B drafts at once with numpy arrays, so the cost is per pick
+    rather than per draft. Card indices refer to positions in card_pool.
+    Raises ValueError if the pool has fewer than 3 neutral cards of a
+    rarity the tables can draw, since offers fall back to neutral cards
+    '''
+    def __init__(self, hero, card_pool=None, regular_p=None, special_p=None,
+                 hero_p=None):
+        if card_pool is None:
+            card_pool = arena.draftable_cards()
+        self.hero = hero
+        self.cards = list(card_pool)
+        regular = arena.probability_tables(
+            arena.REGULAR_TURN_P if regular_p is None else regular_p)[0]
+        special = arena.probability_tables(
+            arena.SPECIAL_TURN_P if special_p is None else special_p)[0]
+        self.regular_p = cumsum(regular)
+        self.special_p = cumsum(special)
+        self.hero_p = arena.probability_tables(
+            arena.HERO_CARD_P if hero_p is None else hero_p)[0]
+        self.bucket = array([clip(c.cost or 0, 0, CURVE_BUCKETS - 1)
+                             for c in self.cards], dtype=int64)
+        self.type = array([c.type or 0 for c in self.cards], dtype=int64)
+        # members[offsets[g, r]:offsets[g, r] + sizes[g, r]] are the pool
+        # indices of the class (g = 0) or neutral (g = 1) cards of rarity r
+        groups = [[[] for _ in arena.TABLE_RARITIES] for _ in range(2)]
+        for i, c in enumerate(self.cards):
+            r = arena.RARITY_COLUMN.get(c.rarity, None)
+            if r is None:
+                continue
+            if c.hero == hero:
+                groups[0][r].append(i)
+            elif c.hero is None:
+                groups[1][r].append(i)
+        self.sizes = array([[len(m) for m in g] for g in groups],
+                           dtype=int64)
+        self.offsets = (cumsum(self.sizes.ravel()) -
+                        self.sizes.ravel()).reshape(self.sizes.shape)
+        self.members = array([i for g in groups for m in g for i in m],
+                             dtype=int64)
+        for r in nonzero((regular > 0) | (special > 0))[0].tolist():
+            if self.sizes[1, r] < 3:
+                raise ValueError(
+                    "{0} neutral {1} cards, an offer needs 3".format(
+                        self.sizes[1, r], arena.TABLE_RARITIES[r].name))
+
+    def offers(self, B, pick, rng):
+        # (int, int, RandomState) -> array(int, (B, 3))
+        '''
+        Returns B offers of 3 pool indices for the 1 based pick number
+        '''
+        table = (self.special_p if pick in arena.SPECIAL_PICKS
+                 else self.regular_p)
+        rarity = minimum(searchsorted(table, rng.random_sample(B) * table[-1],
+                                      side='right'), len(table) - 1)
+        offer = zeros((B, 3), dtype=int64)
+        group = zeros((B, 3), dtype=int64)
+        slot = zeros((B, 3), dtype=int64)
+        for j in range(3):
+            previous = group[:, :j]
+            class_drawn = (previous == 0).sum(axis=1)
+            use_class = ((rng.random_sample(B) <= self.hero_p[rarity]) &
+                         (self.sizes[0, rarity] - class_drawn > 0))
+            g = where(use_class, 0, 1)
+            # uniform slot among the cards of the group not yet offered,
+            # shifted past the slots already taken in ascending order
+            taken = where(previous == g[:, None], slot[:, :j],
+                          self.sizes.max() + 1)
+            taken.sort(axis=1)
+            size = self.sizes[g, rarity] - (taken <= self.sizes.max()).sum(
+                axis=1)
+            s = (rng.random_sample(B) * size).astype(int64)
+            for t in range(j):
+                s += s >= taken[:, t]
+            group[:, j] = g
+            slot[:, j] = s
+            offer[:, j] = self.members[self.offsets[g, rarity] + s]
+        return offer
+
+    def run(self, policy, B=10000, seed=None):
+        # ((offers, DeckState, DraftSimulation) -> (B, 3), int, int)
+        # -> DeckState
+        '''
+        Runs B complete drafts, picking the best scored card of every offer
+        according to policy, and returns the resulting decks
+        '''
+        rng = random.RandomState(seed)
+        deck = DeckState(B)
+        rows = arange(B)
+        for pick in range(1, PICKS + 1):
+            offer = self.offers(B, pick, rng)
+            scores = asarray(policy(offer, deck, self), dtype=float)
+            best = argmax(scores, axis=1)
+            chosen = offer[rows, best]
+            deck.picks[:, pick - 1] = chosen
+            deck.curve[rows, self.bucket[chosen]] += 1
+            deck.types[rows, self.type[chosen]] += 1
+            deck.score += scores[rows, best]
+            deck.pick = pick
+        return deck
@@ -30,3 +30,11 @@ Zone = IntEnum('Zone', tag_to_val().get('ZONE').items())
 SpellZone = IntEnum('SpellZone', tag_to_val().get('SPELL_ZONE').items())
 Requirement = IntEnum('Requirement', tag_to_val().get('REQUIREMENT').items())
 Mechanics = [GameTag[m] for m in tag_to_val().get('MECHANICS')]
+# bit of each mechanic in CardRecord.mechanics_mask
+MechanicBits = {m: 1 << i for (i, m) in enumerate(Mechanics)}
+
+
+def requirement_bit(req):
+    """Bit of a Requirement in CardRecord.requirements_mask
+    """
+    return 1 << int(req)
@@ -2,7 +2,9 @@ import unittest
 from ..arena import (draftable_cards, p_of_no_cards,
                      draft_e, partition_picks,
                      partition_by_rarity, CardPool,
-                     REGULAR_TURN_P, SPECIAL_TURN_P)
+                     REGULAR_TURN_P, SPECIAL_TURN_P,
+                     successes_pmf, DraftNeed, DraftSession,
+                     draft_sd, sweep, TABLE_RARITIES)
 from ..tags import Hero, Rarity
 
 
@@ -77,6 +79,10 @@ class TestArenaFunctions(unittest.TestCase):
         self.assertEqual(len(cp), starting_len - 1)
         cp.replace_drawn()
         self.assertEqual(len(cp), starting_len)
+        # drawn cards are replaced every time, not just the first time
+        cp.draw()
+        cp.replace_drawn()
+        self.assertEqual(len(cp), starting_len)
 
     def test_expectation(self):
         mage_e = lambda pred: draft_e(Hero.MAGE, pred, 30, DRAFT_CARDS)
@@ -135,6 +141,52 @@ class TestArenaFunctions(unittest.TestCase):
             mage_e(lambda c: c.rarity == Rarity.LEGENDARY)])
         self.assertAlmostEqual(sum(turn_rarity_expectations) / 30.0, 1.0)
 
+    def test_successes_pmf(self):
+        for N in range(31):
+            self.assertAlmostEqual(sum(successes_pmf(N, .3, .7)), 1.0)
+        self.assertAlmostEqual(successes_pmf(0, .3, .7)[0], 1.0)
+
+    def test_draft_session(self):
+        is_spell = lambda c: c.is_ability
+        session = DraftSession(Hero.MAGE,
+                               {'spells': DraftNeed(is_spell, 30),
+                                'none': DraftNeed(lambda c: False, 5)},
+                               DRAFT_CARDS)
+        expected = session.expected_deck()
+        self.assertAlmostEqual(expected['spells'],
+                               draft_e(Hero.MAGE, is_spell, 29, DRAFT_CARDS))
+        self.assertAlmostEqual(expected['none'], 0.0)
+        spell = next(c for c in DRAFT_CARDS if is_spell(c))
+        minion = next(c for c in DRAFT_CARDS if c.is_minion)
+        self.assertAlmostEqual(session.score([spell, minion])[0], 1.0)
+        self.assertAlmostEqual(session.score([spell, minion])[1], 0.0)
+        self.assertIs(session.best([minion, spell]), spell)
+        session.pick(spell)
+        self.assertEqual(session.remaining, 29)
+        self.assertAlmostEqual(
+            session.expected_deck()['spells'],
+            1.0 + draft_e(Hero.MAGE, is_spell, 28, DRAFT_CARDS))
+        for _ in range(29):
+            session.pick(minion)
+        self.assertRaises(ValueError, session.pick, minion)
+
+    def test_sweep(self):
+        preds = [lambda c: c.is_ability,
+                 lambda c: c.is_minion and c.cost == 3,
+                 lambda c: c.name == 'Fireball']
+        uniform = {r: 0.25 for r in TABLE_RARITIES}
+        result = sweep(Hero.MAGE, preds, 30, DRAFT_CARDS,
+                       [REGULAR_TURN_P, uniform])
+        self.assertEqual(result['e'].shape, (2, len(preds)))
+        for t, table in enumerate([REGULAR_TURN_P, uniform]):
+            for k, pred in enumerate(preds):
+                self.assertAlmostEqual(
+                    result['e'][t, k],
+                    draft_e(Hero.MAGE, pred, 30, DRAFT_CARDS, table))
+                self.assertAlmostEqual(
+                    result['sd'][t, k],
+                    draft_sd(Hero.MAGE, pred, 30, DRAFT_CARDS, table))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,99 @@
+import shutil
+import tempfile
+import unittest
+from ..arena import draftable_cards, draft_e, draft_sd
+from ..cache import DraftCache
+from ..tags import CardType, Hero, Rarity
+
+
+DRAFT_CARDS = draftable_cards()
+
+
+class _Card(object):
+    def __init__(self, card_id, hero, rarity):
+        self.id = card_id
+        self.hero = hero
+        self.rarity = rarity
+
+
+class TestDraftCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_statistics(self):
+        cache = DraftCache()
+        is_spell = lambda c: c.is_ability
+        self.assertAlmostEqual(
+            cache.draft_e(Hero.MAGE, is_spell, 30, DRAFT_CARDS),
+            draft_e(Hero.MAGE, is_spell, 30, DRAFT_CARDS))
+        self.assertAlmostEqual(
+            cache.draft_sd(Hero.MAGE, is_spell, 30, DRAFT_CARDS),
+            draft_sd(Hero.MAGE, is_spell, 30, DRAFT_CARDS))
+        self.assertAlmostEqual(
+            cache.draft_at_least(Hero.MAGE, is_spell, 0, 30, DRAFT_CARDS),
+            1.0)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 2)
+
+    def test_keyed_by_predicate_result(self):
+        cache = DraftCache(maxsize=2)
+        cache.pmf(Hero.MAGE, lambda c: c.is_ability, 30, DRAFT_CARDS)
+        cache.pmf(Hero.MAGE, lambda c: c.type == CardType.ABILITY, 30,
+                  DRAFT_CARDS)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.pmf(Hero.MAGE, lambda c: c.is_ability, 20, DRAFT_CARDS)
+        cache.pmf(Hero.HUNTER, lambda c: c.is_ability, 30, DRAFT_CARDS)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        self.assertEqual(len(cache), 2)
+
+    def test_pool_changed_in_place(self):
+        is_minion = lambda c: c.is_minion
+        cache = DraftCache()
+        pool = list(DRAFT_CARDS)
+        cache.draft_e(Hero.MAGE, is_minion, 30, pool)
+        # same length and predicate results, different class cards
+        hunter = [c for c in pool if c.hero == Hero.HUNTER and c.is_minion]
+        mage = [i for i, c in enumerate(pool)
+                if c.hero == Hero.MAGE and c.is_minion]
+        for j, i in enumerate(mage):
+            pool[i] = hunter[j % len(hunter)]
+        self.assertAlmostEqual(cache.draft_e(Hero.MAGE, is_minion, 30, pool),
+                               draft_e(Hero.MAGE, is_minion, 30, pool))
+        self.assertEqual(cache.misses, 2)
+
+    def test_disk_tier(self):
+        is_minion = lambda c: c.is_minion
+        cache = DraftCache(directory=self.directory)
+        pmf = cache.pmf(Hero.MAGE, is_minion, 30, DRAFT_CARDS)
+        self.assertFalse(pmf.flags.writeable)
+        other = DraftCache(directory=self.directory)
+        self.assertEqual(list(other.pmf(Hero.MAGE, is_minion, 30,
+                                        DRAFT_CARDS)), list(pmf))
+        self.assertEqual((other.hits, other.misses), (1, 0))
+
+    def test_pool_rarity_changed(self):
+        # same ids, commons and legendaries swapped: e.g. a card data patch
+        # between two runs sharing the disk tier
+        rarities = [Rarity.COMMON, Rarity.RARE, Rarity.EPIC,
+                    Rarity.LEGENDARY]
+        heroes = [Hero.MAGE, None]
+        pool = [_Card("C_{0}".format(i), heroes[i % 2], rarities[i // 2 % 4])
+                for i in range(80)]
+        patched = [_Card(c.id, c.hero, rarities[3 - rarities.index(c.rarity)])
+                   for c in pool]
+        commons = set(c.id for c in pool if c.rarity == Rarity.COMMON)
+        is_common = lambda c: c.id in commons
+        DraftCache(directory=self.directory).draft_e(
+            Hero.MAGE, is_common, 30, pool)
+        cache = DraftCache(directory=self.directory)
+        self.assertAlmostEqual(
+            cache.draft_e(Hero.MAGE, is_common, 30, patched),
+            draft_e(Hero.MAGE, is_common, 30, patched))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+if __name__ == '__main__':
+    unittest.main()
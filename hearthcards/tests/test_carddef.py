@@ -0,0 +1,137 @@
+import unittest
+import xml.etree.ElementTree as ET
+from ..carddef import CardDef, CardStore
+from ..index import MechanicsIndex
+from ..locale import Locale
+from ..tags import GameTag, CardType, Rarity, Requirement
+
+
+ENTITIES = {
+    Locale.US: '''<CardDefs>
+<Entity CardID="EX1_001" version="2">
+    <Tag enumID="185" type="String">Lightwarden</Tag>
+    <Tag enumID="184" type="String">Whenever a character is healed, gain +2 Attack.</Tag>
+    <Tag enumID="48" type="Int" value="1"/>
+    <Tag enumID="47" type="Int" value="1"/>
+    <Tag enumID="45" type="Int" value="2"/>
+    <Tag enumID="202" type="Int" value="4"/>
+    <Tag enumID="203" type="Int" value="3"/>
+    <Tag enumID="321" type="Int" value="1"/>
+    <Tag enumID="190" type="Int" value="1"/>
+</Entity>
+<Entity CardID="EX1_002" version="2">
+    <Tag enumID="185" type="String">The Black Knight</Tag>
+    <Tag enumID="48" type="Int" value="6"/>
+    <Tag enumID="202" type="Int" value="4"/>
+    <Tag enumID="203" type="Int" value="5"/>
+    <Tag enumID="321" type="Int" value="1"/>
+    <Tag enumID="218" type="Int" value="1"/>
+    <EntourageCard cardID="EX1_001"/>
+    <PlayRequirement reqID="1" param=""/>
+</Entity>
+</CardDefs>''',
+    Locale.FR: '''<CardDefs>
+<Entity CardID="EX1_001" version="2">
+    <Tag enumID="185" type="String">Gardelumiere</Tag>
+    <Tag enumID="48" type="Int" value="1"/>
+</Entity>
+<Entity CardID="EX1_002" version="2">
+    <Tag enumID="185" type="String">Le Chevalier noir</Tag>
+    <Tag enumID="48" type="Int" value="6"/>
+</Entity>
+</CardDefs>'''}
+
+
+def make_store():
+    store = CardStore()
+    for locale, xml in sorted(ENTITIES.items(), key=lambda x: x[0].value):
+        store.add_locale(locale, ET.fromstring(xml).iter('Entity'))
+    return store
+
+
+class TestCardStore(unittest.TestCase):
+
+    def test_views_share_records(self):
+        store = make_store()
+        self.assertEqual(len(store), 2)
+        us = {c.id: c for c in store.cards(Locale.US)}
+        fr = {c.id: c for c in store.cards(Locale.FR)}
+        self.assertIs(us["EX1_001"].record, fr["EX1_001"].record)
+        self.assertEqual(us["EX1_001"].name, "Lightwarden")
+        self.assertEqual(fr["EX1_001"].name, "Gardelumiere")
+        self.assertEqual(fr["EX1_001"].cost, 1)
+        self.assertEqual(fr["EX1_001"].rarity, Rarity.RARE)
+        self.assertEqual(fr["EX1_002"].entourage_cards, ["EX1_001"])
+        self.assertIsNone(fr["EX1_001"].cardtext_inhand)
+
+    def test_view_matches_xml_card_def(self):
+        store = make_store()
+        el = next(ET.fromstring(ENTITIES[Locale.US]).iter('Entity'))
+        card = CardDef(el)
+        view = next(c for c in store.cards(Locale.US) if c.id == card.id)
+        self.assertEqual(card.repr(Locale.US), view.repr(Locale.US))
+        self.assertEqual(card.type, CardType.MINION)
+        self.assertIn(GameTag.TAUNT, card.mechanics)
+
+    def test_lookup(self):
+        store = make_store()
+        card = store.get("EX1_001", Locale.FR)
+        self.assertEqual(card.name, "Gardelumiere")
+        self.assertIs(card, store.get("EX1_001", Locale.FR))
+        self.assertIsNone(store.get("bogus id", Locale.FR))
+        self.assertEqual(store.find("the BLACK knight"),
+                         [store.get("EX1_002")])
+        self.assertEqual(store.find("bogus card name"), [])
+
+    def test_string_tables(self):
+        store = make_store()
+        table = store.strings[Locale.FR]
+        self.assertEqual(list(table), ["EX1_001", "EX1_002"])
+        self.assertEqual(table["EX1_001"],
+                         {GameTag.CARDNAME: "Gardelumiere"})
+        self.assertNotIn(GameTag.CARDTEXT_INHAND, table["EX1_001"])
+        self.assertRaises(KeyError, lambda: table["bogus id"])
+        # cards with the same String tags share their key tuple
+        self.assertIs(table["EX1_001"]._keys, table["EX1_002"]._keys)
+        warden = store.records["EX1_001"]
+        self.assertEqual(warden.tags[GameTag.COST], 1)
+        self.assertNotIn(GameTag.ATK, store.records["EX1_002"].tags)
+
+    def test_entourage(self):
+        store = make_store()
+        knight = store.get("EX1_002", Locale.FR)
+        self.assertEqual(knight.entourage, [store.get("EX1_001", Locale.FR)])
+        self.assertEqual(knight.entourage[0].name, "Gardelumiere")
+        self.assertEqual(store.get("EX1_001").entourage, [])
+
+
+class TestMechanicsIndex(unittest.TestCase):
+
+    def test_bitmasks(self):
+        store = make_store()
+        warden, knight = store.get("EX1_001"), store.get("EX1_002")
+        self.assertTrue(warden.has_mechanic(GameTag.TAUNT))
+        self.assertFalse(knight.has_mechanic(GameTag.TAUNT))
+        self.assertTrue(knight.has_mechanic(GameTag.BATTLECRY))
+        self.assertTrue(knight.has_requirement(Requirement(1)))
+        self.assertFalse(warden.has_requirement(Requirement(1)))
+
+    def test_queries(self):
+        store = make_store()
+        index = MechanicsIndex(store.cards(Locale.US))
+        ids = lambda **q: sorted(c.id for c in index.select(**q))
+        self.assertEqual(
+            [index.cards[i].id for i in index.with_mechanic(GameTag.TAUNT)],
+            ["EX1_001"])
+        self.assertEqual(ids(any_of=[GameTag.TAUNT, GameTag.BATTLECRY]),
+                         ["EX1_001", "EX1_002"])
+        self.assertEqual(ids(all_of=[GameTag.TAUNT, GameTag.BATTLECRY]), [])
+        self.assertEqual(ids(none_of=[GameTag.TAUNT]), ["EX1_002"])
+        self.assertEqual(ids(requirements=[Requirement(1)]), ["EX1_002"])
+        self.assertEqual(ids(heroes=[None], types=[CardType.MINION]),
+                         ["EX1_001", "EX1_002"])
+        self.assertEqual(ids(heroes=[]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
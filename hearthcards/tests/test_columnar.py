@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+from .. import columnar
+from ..carddef import CardRecord
+from ..locale import Locale
+from ..search import search_indices
+from .test_carddef import make_store
+
+
+class TestColumnar(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameStore(self, store, loaded):
+        self.assertEqual(list(loaded.records), list(store.records))
+        for card_id, record in store.records.items():
+            for field in CardRecord.__slots__:
+                self.assertEqual(getattr(loaded.records[card_id], field),
+                                 getattr(record, field))
+        self.assertEqual(loaded.locales, store.locales)
+        self.assertEqual(loaded.strings, store.strings)
+
+    def test_round_trip(self):
+        store = make_store()
+        self.assertSameStore(store, columnar.from_arrays(
+            columnar.to_arrays(store)))
+
+    def test_save_load(self):
+        store = make_store()
+        path = os.path.join(self.directory, "cards.npz")
+        columnar.save(store, path)
+        loaded = columnar.load(path)
+        self.assertSameStore(store, loaded)
+        card = loaded.get("EX1_002", Locale.FR)
+        self.assertEqual(card.name, "Le Chevalier noir")
+        self.assertEqual(card.entourage[0].name, "Gardelumiere")
+
+    def test_strings_stored_once(self):
+        store = make_store()
+        arrays = columnar.to_arrays(store)
+        strings = [columnar.text_at(arrays, i)
+                   for i in range(len(arrays["text.offsets"]) - 1)]
+        self.assertEqual(len(strings), len(set(strings)))
+        self.assertEqual(strings.count("EX1_001"), 1)
+
+    def test_search_indices(self):
+        store = make_store()
+        store.search_indices = search_indices(store.as_dict())
+        path = os.path.join(self.directory, "cards.npz")
+        columnar.save(store, path)
+        loaded = columnar.load(path)
+        self.assertEqual(sorted(loaded.search_indices, key=str),
+                         sorted(store.search_indices, key=str))
+        for locale, index in store.search_indices.items():
+            other = loaded.search_indices[locale]
+            self.assertEqual(list(other.ids), index.ids)
+            self.assertEqual(list(other.vocab), index.vocab)
+            self.assertEqual(dict(other.postings), index.postings)
+        index = loaded.search_indices[Locale.US]
+        self.assertEqual(index.search("black kni"), ["EX1_002"])
+        self.assertEqual(index.search("lightwardne", fuzzy=True),
+                         ["EX1_001"])
+        self.assertEqual(index.search("bogus"), [])
+        # replacing a locale drops its index
+        loaded.add_locale(Locale.FR, [])
+        self.assertNotIn(Locale.FR, loaded.search_indices)
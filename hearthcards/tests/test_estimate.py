@@ -0,0 +1,66 @@
+import random
+import unittest
+from numpy import random as np_random
+from ..arena import (draftable_cards, arena_draft, REGULAR_TURN_P,
+                     SPECIAL_TURN_P, HERO_CARD_P, SPECIAL_PICKS)
+from ..estimate import DraftEstimator
+from ..tags import Hero, Rarity
+
+
+DRAFT_CARDS = draftable_cards()
+
+
+def logged_offers(drafts, heroes):
+    # arena_draft returns the regular picks before the special picks
+    regular = [p for p in range(1, 31) if p not in SPECIAL_PICKS]
+    order = regular + list(SPECIAL_PICKS)
+    records = ([], [], [])
+    for i in range(drafts):
+        hero = heroes[i % len(heroes)]
+        for pick, offer in zip(order, arena_draft(hero, DRAFT_CARDS)):
+            records[0].append(hero)
+            records[1].append(pick)
+            records[2].append([c.id for c in offer])
+    return records
+
+
+class TestDraftEstimator(unittest.TestCase):
+
+    def test_recovers_draft_probabilities(self):
+        random.seed(0)
+        np_random.seed(0)
+        heroes, picks, card_ids = logged_offers(
+            200, [Hero.MAGE, Hero.HUNTER, Hero.PRIEST])
+        estimator = DraftEstimator(DRAFT_CARDS)
+        # two chunks, accumulated by separate estimators and merged
+        half = len(heroes) // 2
+        estimator.update(heroes[:half], picks[:half], card_ids[:half])
+        other = DraftEstimator(DRAFT_CARDS)
+        other.update(heroes[half:], picks[half:], card_ids[half:])
+        estimator += DraftEstimator.from_dict(other.to_dict(), DRAFT_CARDS)
+        self.assertEqual(estimator.rejected, 0)
+        self.assertEqual(estimator.turns.sum(), 200 * 30)
+        for (estimated, actual) in [
+                (estimator.regular_turn_p(0.999), REGULAR_TURN_P),
+                (estimator.special_turn_p(0.999), SPECIAL_TURN_P),
+                (estimator.hero_card_p(0.999), HERO_CARD_P)]:
+            self.assertEqual(set(estimated), set(actual))
+            for r, (p, lo, hi) in estimated.items():
+                self.assertLessEqual(lo, actual[r])
+                self.assertGreaterEqual(hi, actual[r])
+
+    def test_rejects_invalid_offers(self):
+        estimator = DraftEstimator(DRAFT_CARDS)
+        card = DRAFT_CARDS[0]
+        estimator.update([Hero.MAGE], [2], [["bogus", card.id, card.id]])
+        self.assertEqual(estimator.rejected, 1)
+        self.assertEqual(estimator.turns.sum(), 0)
+        common = [c.id for c in DRAFT_CARDS
+                  if c.hero is None and c.rarity == Rarity.COMMON][:3]
+        estimator.update([Hero.MAGE] * 3, [0, 31, 2], [common] * 3)
+        self.assertEqual(estimator.rejected, 3)
+        self.assertEqual(estimator.turns.sum(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
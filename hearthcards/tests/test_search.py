@@ -0,0 +1,59 @@
+import io
+import unittest
+from ..locale import Locale
+from ..search import SearchIndex, tokenize
+from .test_carddef import make_store
+
+
+class TestSearch(unittest.TestCase):
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("<b>Battlecry:</b> Deal $3 damage.",
+                                  Locale.US),
+                         ["battlecry", "deal", "3", "damage"])
+        self.assertEqual(tokenize("火球术", Locale.CN),
+                         ["火", "球", "术", "火球", "球术"])
+        self.assertEqual(tokenize(None, Locale.CN), [])
+
+    def test_search(self):
+        store = make_store()
+        index = SearchIndex.from_cards(store.cards(Locale.US), Locale.US)
+        self.assertEqual(index.search("black knight"), ["EX1_002"])
+        self.assertEqual(index.search("black kni"), ["EX1_002"])
+        self.assertEqual(index.search("black kni", prefix=False), [])
+        self.assertEqual(index.search("lightwardne"), [])
+        self.assertEqual(index.search("lightwardne", fuzzy=True), ["EX1_001"])
+        self.assertEqual(index.search("healed"), ["EX1_001"])
+        self.assertEqual(index.search("the", prefix=False), ["EX1_002"])
+
+    def test_fuzzy_short_tokens(self):
+        postings = {"card": {0: 4, 1: 4, 2: 4}, "3": {0: 4}, "4": {1: 4},
+                    "35": {2: 4}, "cards": {3: 4}}
+        index = SearchIndex(Locale.US, ["A", "B", "C", "D"], postings)
+        self.assertEqual(index.search("card 3", prefix=False, fuzzy=True),
+                         ["A"])
+        self.assertEqual(index.search("car", prefix=False, fuzzy=True),
+                         ["A", "B", "C"])
+        self.assertEqual(index.similar("3"), [])
+
+    def test_fuzzy_cjk(self):
+        postings = {"火": {0: 4}, "球": {1: 4}, "术": {2: 4}, "화": {3: 4},
+                    "火球": {0: 4}}
+        index = SearchIndex(Locale.CN, ["A", "B", "C", "D"], postings)
+        self.assertEqual(index.search("球", fuzzy=True), ["B"])
+        self.assertEqual(index.search("火", prefix=False, fuzzy=True), ["A"])
+
+    def test_dump_load(self):
+        store = make_store()
+        index = SearchIndex.from_cards(store.cards(Locale.FR), Locale.FR)
+        f = io.StringIO()
+        index.dump(f)
+        f.seek(0)
+        loaded = SearchIndex.load(f)
+        self.assertEqual(loaded.locale, Locale.FR)
+        self.assertEqual(loaded.search("cheval"), index.search("cheval"))
+        self.assertEqual(loaded.search("cheval"), ["EX1_002"])
+
+
+if __name__ == '__main__':
+    unittest.main()
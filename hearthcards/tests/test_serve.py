@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+from ..arena import draftable_cards, draft_e
+from ..serve import Filter, Service, ServiceError
+from ..tags import CardType, Hero
+
+
+DRAFT_CARDS = draftable_cards()
+
+
+class TestFilter(unittest.TestCase):
+
+    def test_filter(self):
+        card = next(c for c in DRAFT_CARDS if c.is_minion and c.hero)
+        self.assertTrue(Filter({})(card))
+        self.assertTrue(Filter({"type": "MINION", "id": card.id})(card))
+        self.assertFalse(Filter({"type": "ABILITY"})(card))
+        self.assertTrue(Filter({"hero": card.hero.name})(card))
+        self.assertFalse(Filter({"hero": None})(card))
+        self.assertTrue(Filter({"cost": card.cost})(card))
+        self.assertTrue(Filter({"cost": {"min": card.cost}})(card))
+        self.assertFalse(Filter({"cost": {"max": card.cost - 1}})(card))
+        self.assertTrue(Filter({"name": card.name.upper()})(card))
+        self.assertTrue(Filter({"any": [{"type": "ABILITY"},
+                                        {"not": {"type": "WEAPON"}}]})(card))
+        self.assertRaises(ServiceError, Filter, {"colour": "red"})
+        self.assertRaises(ServiceError, Filter, {"type": "SPACESHIP"})
+        for cost in ("abc", {"min": "a"}, {"max": None}, True):
+            with self.assertRaises(ServiceError) as e:
+                Filter({"cost": cost})
+            self.assertEqual(e.exception.message, "bad filter value for cost")
+
+
+class TestService(unittest.TestCase):
+
+    def test_dispatch(self):
+        service = Service()
+        run = lambda op, params: asyncio.run(service.dispatch(op, params))
+        card = DRAFT_CARDS[0]
+        self.assertEqual(run("card", {"id": card.id})["name"], card.name)
+        self.assertEqual(run("find", {"name": card.name})[0]["id"], card.id)
+        self.assertAlmostEqual(
+            run("draft", {"hero": "MAGE", "filter": {"type": "ABILITY"}}),
+            draft_e(Hero.MAGE, lambda c: c.type == CardType.ABILITY, 30,
+                    DRAFT_CARDS))
+        results = run("batch", [{"op": "card", "params": {"id": card.id}},
+                                {"op": "card", "params": {"id": "bogus"}}])
+        self.assertEqual(results[0]["result"]["id"], card.id)
+        self.assertEqual(results[1]["status"], 404)
+        with self.assertRaises(ServiceError):
+            run("draft", {"hero": "MAGE", "filter": {}, "stat": "p"})
+
+    def test_bad_parameters(self):
+        service = Service()
+        respond = lambda target: asyncio.run(
+            service._respond("GET", target, b""))
+        for target in ("/search?q=a&limit=ten",
+                       "/draft?hero=MAGE&N=x&filter={}",
+                       "/draft?hero=MAGE&stat=p&k=one&filter={}"):
+            status, result = respond(target)
+            self.assertEqual(status, 400)
+            self.assertIn("must be an integer", result["error"])
+        self.assertEqual(respond("/search?q=a&limit=-1"),
+                         (400, {"error": "limit must not be negative"}))
+        card = DRAFT_CARDS[0]
+        results = asyncio.run(service.dispatch("batch", [
+            {"op": "card", "params": {"id": card.id}},
+            {"op": "search", "params": {"q": "a", "limit": "ten"}},
+            {"op": "draft", "params": {"hero": "MAGE", "filter": {},
+                                       "N": "x"}}]))
+        self.assertEqual(results[0]["result"]["id"], card.id)
+        self.assertEqual([r["status"] for r in results[1:]], [400, 400])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from numpy import array
+from .. import arena, shared
+from ..locale import Locale
+from ..search import search_indices
+from ..tags import GameTag, Requirement
+from .test_carddef import make_store
+
+
+def _worker_name(name, card_id, queue):
+    store = shared.attach(name)
+    queue.put(store.get(card_id, Locale.FR).name)
+
+
+class TestSharedCardStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameCards(self, store, attached):
+        self.assertEqual(len(attached), len(store))
+        self.assertEqual(attached.locales, store.locales)
+        for locale in store.locales:
+            self.assertEqual([c.repr(locale) for c in attached.cards(locale)],
+                             [c.repr(locale) for c in store.cards(locale)])
+
+    @unittest.skipIf(shared.shared_memory is None, "no shared memory")
+    def test_shared_memory(self):
+        store = make_store()
+        published = shared.publish(store)
+        try:
+            attached = shared.attach(published.name)
+            self.assertSameCards(store, attached)
+            queue = multiprocessing.Queue()
+            worker = multiprocessing.Process(
+                target=_worker_name, args=(published.name, "EX1_002", queue))
+            worker.start()
+            self.assertEqual(queue.get(timeout=30), "Le Chevalier noir")
+            worker.join()
+            # the block outlives the worker
+            self.assertEqual(shared.attach(published.name).get(
+                "EX1_001").name, "Lightwarden")
+        finally:
+            published.close()
+            published.unlink()
+
+    def test_file(self):
+        store = make_store()
+        store.search_indices = search_indices(store.as_dict())
+        path = os.path.join(self.directory, "cards.bin")
+        shared.publish(store, path=path)
+        attached = shared.attach(path=path)
+        self.assertSameCards(store, attached)
+        card = attached.get("EX1_002")
+        self.assertEqual(card.name, "The Black Knight")
+        self.assertTrue(card.has_mechanic(GameTag.BATTLECRY))
+        self.assertTrue(card.has_requirement(Requirement.REQ_MINION_TARGET))
+        self.assertEqual(card.entourage[0].name, "Lightwarden")
+        self.assertIsNone(attached.get("EX1_003"))
+        self.assertIsNone(attached.get("EX1_00"))
+        self.assertEqual(attached.find("lightwarden")[0].id, "EX1_001")
+        self.assertEqual(
+            attached.search_indices[Locale.FR].search("chevalier"),
+            ["EX1_002"])
+
+    def test_read_only(self):
+        path = os.path.join(self.directory, "cards.bin")
+        shared.publish(make_store(), path=path)
+        attached = shared.attach(path=path)
+        with self.assertRaises(ValueError):
+            attached.arrays["tags.values"][0] = 0
+
+    def test_draftable_cards(self):
+        store = make_store()
+        path = os.path.join(self.directory, "cards.bin")
+        shared.publish(store, path=path)
+        attached = shared.attach(path=path)
+        self.assertEqual(attached.tag_values(GameTag.COST).tolist(), [1, 6])
+        self.assertEqual(attached.tag_values(GameTag.ATK, -1).tolist(),
+                         [1, -1])
+        self.assertEqual(
+            [c.name for c in attached.cards_where(Locale.FR,
+                                                  array([False, True]))],
+            ["Le Chevalier noir"])
+        cached = getattr(arena.draftable_cards, 'store', None), \
+            getattr(arena.draftable_cards, 'data', None)
+        try:
+            cards = arena.draftable_cards(store=attached)
+            self.assertEqual([c.id for c in cards],
+                             [c.id for c in store.cards(Locale.US)
+                              if arena.is_draftable(c)])
+            self.assertIs(arena.draftable_cards(), cards)
+            self.assertEqual(list(arena.draftable_cards.data), [Locale.US])
+        finally:
+            arena.draftable_cards.store, arena.draftable_cards.data = cached
@@ -0,0 +1,70 @@
+import unittest
+from numpy import array, random
+from ..arena import (draftable_cards, p_of_successful_regular_turn,
+                     p_of_successful_special_turn)
+from ..simulate import DraftSimulation, PickPolicy, CURVE_BUCKETS, PICKS
+from ..tags import CardType, Hero, Rarity
+
+
+DRAFT_CARDS = draftable_cards()
+
+
+class TestDraftSimulation(unittest.TestCase):
+
+    def test_offers(self):
+        sim = DraftSimulation(Hero.MAGE, DRAFT_CARDS)
+        rng = random.RandomState(0)
+        is_spell = array([c.is_ability for c in DRAFT_CARDS])
+        for pick, p in [
+                (2, p_of_successful_regular_turn(
+                    Hero.MAGE, lambda c: c.is_ability, DRAFT_CARDS)),
+                (1, p_of_successful_special_turn(
+                    Hero.MAGE, lambda c: c.is_ability, DRAFT_CARDS))]:
+            offers = sim.offers(50000, pick, rng)
+            self.assertTrue((offers[:, 0] != offers[:, 1]).all())
+            self.assertTrue((offers[:, 0] != offers[:, 2]).all())
+            self.assertTrue((offers[:, 1] != offers[:, 2]).all())
+            heroes = {DRAFT_CARDS[i].hero for i in offers.ravel()}
+            self.assertEqual(heroes - {Hero.MAGE, None}, set())
+            self.assertAlmostEqual(is_spell[offers].any(axis=1).mean(), p, 2)
+
+    def test_run(self):
+        sim = DraftSimulation(Hero.MAGE, DRAFT_CARDS)
+        minions_only = PickPolicy([1.0 if c.is_minion else 0.0
+                                   for c in DRAFT_CARDS])
+        deck = sim.run(minions_only, B=1000, seed=0)
+        self.assertTrue((deck.picks >= 0).all())
+        self.assertTrue((deck.curve.sum(axis=1) == PICKS).all())
+        self.assertEqual(deck.curve.shape, (1000, CURVE_BUCKETS))
+        self.assertTrue((deck.type_counts(CardType.MINION) ==
+                         deck.score).all())
+        spells_only = PickPolicy([1.0 if c.is_ability else 0.0
+                                  for c in DRAFT_CARDS])
+        spell_deck = sim.run(spells_only, B=1000, seed=0)
+        self.assertGreater(spell_deck.type_counts(CardType.ABILITY).mean(),
+                           deck.type_counts(CardType.ABILITY).mean())
+
+    def test_curve_policy(self):
+        sim = DraftSimulation(Hero.MAGE, DRAFT_CARDS)
+        flat = PickPolicy([0.0] * len(DRAFT_CARDS))
+        curve = [0, 0, 30, 0, 0, 0, 0, 0]
+        two_drops = PickPolicy([0.0] * len(DRAFT_CARDS), curve, 1.0)
+        self.assertGreater(
+            sim.run(two_drops, B=500, seed=0).curve[:, 2].mean(),
+            sim.run(flat, B=500, seed=0).curve[:, 2].mean())
+
+    def test_small_pool(self):
+        legendary = [c for c in DRAFT_CARDS
+                     if c.hero is None and c.rarity == Rarity.LEGENDARY]
+        pool = [c for c in DRAFT_CARDS if c not in legendary[2:]]
+        self.assertRaises(ValueError, DraftSimulation, Hero.MAGE, pool)
+        no_legendaries = {Rarity.COMMON: .9, Rarity.RARE: .1}
+        sim = DraftSimulation(Hero.MAGE, pool, regular_p=no_legendaries,
+                              special_p=no_legendaries)
+        offers = sim.offers(1000, 1, random.RandomState(0))
+        self.assertNotIn(Rarity.LEGENDARY,
+                         {pool[i].rarity for i in offers.ravel()})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from .. import timing
+from ..arena import draftable_cards, arena_draft, p_of_no_cards
+from ..tags import Hero
+
+
+DRAFT_CARDS = draftable_cards()
+
+
+class TestTiming(unittest.TestCase):
+
+    def tearDown(self):
+        timing.disable()
+
+    def test_disabled_by_default(self):
+        self.assertFalse(timing.enabled())
+        with timing.phase("nothing"):
+            timing.count("nothing")
+
+    def test_report(self):
+        report = timing.enable()
+        arena_draft(Hero.MAGE, DRAFT_CARDS)
+        p_of_no_cards(20, 0, .5, 20, 0)
+        timing.count("widgets", 3)
+        timing.count("widgets")
+        self.assertEqual(report.phases["arena.arena_draft"][0], 1)
+        # one partition for the class and one for the neutral cards
+        self.assertEqual(report.phases["arena.partition_by_rarity"][0], 2)
+        self.assertEqual(report.phases["arena.p_of_no_cards"][0], 1)
+        self.assertEqual(report.counts["widgets"], 4)
+        self.assertIn("arena.arena_draft", report.format())
+        self.assertIn("arena.arena_draft", report.dumps())
+
+    def test_callback_sink(self):
+        events = []
+        timing.enable(timing.CallbackSink(
+            lambda kind, name, value: events.append((kind, name))))
+        with timing.phase("outer"):
+            timing.count("inner")
+        self.assertEqual(events, [("count", "inner"), ("phase", "outer")])
+
+
+if __name__ == '__main__':
+    unittest.main()
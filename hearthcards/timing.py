@@ -0,0 +1,171 @@
+import json
+import logging
+import sys
+from time import perf_counter
+
+
+'''
+timing module for measuring where card loading and arena calculations spend
+their time. Instrumented code wraps its phases in `with timing.phase(name)`
+and bumps counters with timing.count(name). Both are no-ops until a sink is
+installed with timing.enable:
+
+    report = timing.enable()
+    card_db()
+    print(report.format())
+
+A sink is any object with phase(name, seconds) and count(name, n) methods,
+see Report, CallbackSink and LoggingSink
+'''
+
+_sink = None
+
+
+class _NullPhase(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase(object):
+    __slots__ = ('name', 'sink', 'start')
+
+    def __init__(self, name, sink):
+        self.name = name
+        self.sink = sink
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.sink.phase(self.name, perf_counter() - self.start)
+        return False
+
+
+def phase(name):
+    # str -> context manager
+    '''
+    Returns a context manager timing its body as the phase name
+    '''
+    sink = _sink
+    return _NULL_PHASE if sink is None else _Phase(name, sink)
+
+
+def count(name, n=1):
+    # (str, int) -> void
+    '''
+    Adds n to the counter name
+    '''
+    if _sink is not None:
+        _sink.count(name, n)
+
+
+def enable(sink=None):
+    # sink -> sink
+    '''
+    Installs sink, a new Report by default, and returns it
+    '''
+    global _sink
+    _sink = Report() if sink is None else sink
+    return _sink
+
+
+def disable():
+    # (void) -> void
+    global _sink
+    _sink = None
+
+
+def enabled():
+    # (void) -> bool
+    return _sink is not None
+
+
+class Report(object):
+    '''
+    Report accumulates the number of calls and total seconds of each phase
+    and the total of each counter
+    '''
+    def __init__(self):
+        self.phases = {}
+        self.counts = {}
+
+    def phase(self, name, seconds):
+        calls, total = self.phases.get(name, (0, 0.0))
+        self.phases[name] = (calls + 1, total + seconds)
+
+    def count(self, name, n):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def to_dict(self):
+        # (void) -> dict
+        return {"phases": {name: {"calls": calls, "seconds": seconds}
+                           for name, (calls, seconds) in self.phases.items()},
+                "counts": dict(self.counts)}
+
+    def dumps(self):
+        # (void) -> str
+        return json.dumps(self.to_dict(), sort_keys=True, indent=4)
+
+    def format(self):
+        # (void) -> str
+        '''
+        Returns a human readable table of the phases, slowest first, and of
+        the counters
+        '''
+        lines = ["{0:<40} {1:>8} {2:>12}".format("phase", "calls",
+                                                  "seconds")]
+        for name, (calls, seconds) in sorted(self.phases.items(),
+                                             key=lambda x: -x[1][1]):
+            lines.append("{0:<40} {1:>8} {2:>12.6f}".format(name, calls,
+                                                             seconds))
+        if self.counts:
+            lines.append("")
+            lines.append("{0:<40} {1:>8}".format("counter", "count"))
+            for name, n in sorted(self.counts.items()):
+                lines.append("{0:<40} {1:>8}".format(name, n))
+        return "\n".join(lines)
+
+
+class CallbackSink(object):
+    '''
+    Forwards every measurement to callback(kind, name, value), where kind
+    is "phase" (value in seconds) or "count"
+    '''
+    def __init__(self, callback):
+        self.callback = callback
+
+    def phase(self, name, seconds):
+        self.callback("phase", name, seconds)
+
+    def count(self, name, n):
+        self.callback("count", name, n)
+
+
+class LoggingSink(object):
+    '''
+    Logs every phase, by default to the hearthcards.timing logger at DEBUG
+    level. Counters are not logged, as they can be bumped once per card
+    '''
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def phase(self, name, seconds):
+        self.logger.log(self.level, "%s took %.6fs", name, seconds)
+
+    def count(self, name, n):
+        pass
+
+
+def print_report(report, file=sys.stderr):
+    # (Report, file) -> void
+    print(report.format(), file=file)